@@ -1,31 +1,593 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context, has_request_context
 from flask_pymongo import PyMongo
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import atexit
+import copy
+import functools
+import itertools
+import logging
+import logging.handlers
 import os
+import re
+import sys
+import uuid
+import csv
+import io
+import queue
+import random
+import threading
+import time
 from werkzeug.exceptions import BadRequest
+from werkzeug.http import quote_etag
 import json
 from dotenv import load_dotenv
+from ledger import Ledger, stored_split_amounts
+from pymongo import UpdateOne, DeleteOne, ReplaceOne, ReadPreference, ReturnDocument, WriteConcern
+from pymongo.read_preferences import PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
 import pymongo.errors
+import pymongo.monitoring
+import click
+import msgpack
+from flask.json.provider import DefaultJSONProvider
 
 # Load environment variables
 load_dotenv(dotenv_path=".env")
 
+# JSON responses render ObjectIds (e.g. IDs sent natively in msgpack request bodies) as strings
+class ApiJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(value):
+        if isinstance(value, ObjectId):
+            return str(value)
+        return DefaultJSONProvider.default(value)
+
 app = Flask(__name__)
+app.json = ApiJSONProvider(app)
+
+# Structured logging: records are formatted as one JSON object per line by a
+# QueueListener thread. Request threads only put records on a bounded queue,
+# never block on log I/O, and drop records (counted in /metrics) if the queue
+# is full. Repeated errors are rate limited per route and message.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_ERROR_BURST = int(os.getenv('LOG_ERROR_BURST', 5))
+LOG_ERROR_WINDOW_S = float(os.getenv('LOG_ERROR_WINDOW_S', 60))
+
+# The request being served on this thread: its ID and route, its /batch
+# nesting depth and its MongoDB round-trip count. Log records and command
+# events are produced on the serving thread, so a thread-local maps them back.
+request_stats = threading.local()
+
+# Attributes every LogRecord has; anything else was passed through extra=
+LOG_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['traceback'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        entry.update({key: value for key, value in vars(record).items() if key not in LOG_RECORD_FIELDS})
+        return json.dumps(entry, default=str)
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = getattr(request_stats, 'request_id', None)
+        record.route = getattr(request_stats, 'route', None) or 'background'
+        return True
+
+class ErrorRateLimitFilter(logging.Filter):
+    def __init__(self, burst, window_s):
+        super().__init__()
+        self.burst = burst
+        self.window_s = window_s
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.ERROR:
+            return True
+        key = (record.route, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            started, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - started >= self.window_s:
+                if suppressed:
+                    record.suppressed = suppressed
+                started, count, suppressed = now, 0, 0
+            if count >= self.burst:
+                self._windows[key] = (started, count, suppressed + 1)
+                return False
+            self._windows[key] = (started, count + 1, suppressed)
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() formats the record (traceback included) on the calling
+    # thread and folds it into msg. Only the message arguments are merged here;
+    # JsonFormatter renders exc_info on the listener thread.
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment('logging.dropped')
+
+def configure_logging():
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(ErrorRateLimitFilter(LOG_ERROR_BURST, LOG_ERROR_WINDOW_S))
+    
+    log = logging.getLogger('splitapp')
+    log.setLevel(LOG_LEVEL)
+    log.addHandler(queue_handler)
+    log.propagate = False
+    # Flask reports unhandled exceptions through app.logger
+    app.logger.handlers[:] = [queue_handler]
+    app.logger.propagate = False
+    
+    listener.start()
+    atexit.register(listener.stop)
+    return log
+
+logger = configure_logging()
+
+# Request IDs: taken from X-Request-ID when it is a reasonable token, otherwise
+# generated, attached to every log record and echoed on the response
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+# Registered first, so it opens the request context before the other hooks
+# and (teardowns run in reverse) closes it after them
+@app.before_request
+def assign_request_id():
+    request_stats.depth = getattr(request_stats, 'depth', 0) + 1
+    if request_stats.depth > 1:
+        # Batch sub-requests keep the outer request's ID and route
+        return
+    incoming = request.headers.get('X-Request-ID', '')
+    request_stats.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+    request_stats.route = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+
+@app.after_request
+def echo_request_id(response):
+    if getattr(request_stats, 'request_id', None):
+        response.headers['X-Request-ID'] = request_stats.request_id
+    return response
+
+@app.teardown_request
+def clear_request_id(error=None):
+    request_stats.depth = max(getattr(request_stats, 'depth', 1) - 1, 0)
+    if not request_stats.depth:
+        request_stats.request_id = None
+        request_stats.route = None
+
+# Helper function to hide credentials in a MongoDB URI before logging it
+def redact_uri(uri):
+    return re.sub(r'//[^@/]+@', '//***@', uri)
+
+# Lightweight in-process metrics, exposed through GET /metrics
+class Metrics:
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._series = {}
+        self._counters = {}
+
+    def observe(self, name, value):
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                series = {'count': 0, 'sum': 0.0, 'max': 0.0, 'recent': deque(maxlen=self._window)}
+                self._series[name] = series
+            series['count'] += 1
+            series['sum'] += value
+            series['max'] = max(series['max'], value)
+            series['recent'].append(value)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            result = {'counters': dict(self._counters), 'series': {}}
+            for name, series in self._series.items():
+                recent = sorted(series['recent'])
+                result['series'][name] = {
+                    'count': series['count'],
+                    'avg': round(series['sum'] / series['count'], 3),
+                    'max': round(series['max'], 3),
+                    'p50': round(percentile(recent, 50), 3),
+                    'p95': round(percentile(recent, 95), 3),
+                    'p99': round(percentile(recent, 99), 3)
+                }
+            return result
+
+# Helper function to read a percentile from an already sorted list
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return float(sorted_values[index])
+
+metrics = Metrics()
 
 # MongoDB Configuration
 MONGO_URI = os.getenv("MONGO_URI")
 if not MONGO_URI:
-    print("Error: MONGO_URI not found in environment variables")
-    print("Please check your .env file and make sure MONGO_URI is set")
+    logger.critical("MONGO_URI not found in environment variables; check your .env file and make sure MONGO_URI is set")
     exit(1)
 
 app.config["MONGO_URI"] = MONGO_URI
-print(f"🔗 Connecting to MongoDB Atlas with URI: {MONGO_URI}")
+logger.info("Connecting to MongoDB Atlas", extra={'mongo_uri': redact_uri(MONGO_URI)})
+
+# Connection pool sizing: one connection per serving thread plus headroom for
+# background threads (write coalescing and other maintenance work)
+SERVING_THREADS = int(os.getenv('SERVING_THREADS', 8))
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', SERVING_THREADS + 4))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 300000))
+
+# Read routing for the heavy read endpoints (/balances, /settlements, GET /expenses)
+MONGO_HEAVY_READ_PREFERENCE = os.getenv('MONGO_HEAVY_READ_PREFERENCE', 'primary')
+MONGO_MAX_STALENESS_S = int(os.getenv('MONGO_MAX_STALENESS_S', 90))
+
+# Write concern for add_expense
+MONGO_EXPENSE_WRITE_W = os.getenv('MONGO_EXPENSE_WRITE_W', 'majority')
+MONGO_EXPENSE_WRITE_JOURNAL = os.getenv('MONGO_EXPENSE_WRITE_JOURNAL', 'false').lower() == 'true'
+
+READ_PREFERENCE_MODES = {
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest
+}
+
+# Helper function to build the read preference used by heavy read endpoints
+def build_heavy_read_preference(mode, max_staleness):
+    if mode == 'primary':
+        return ReadPreference.PRIMARY
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"MONGO_HEAVY_READ_PREFERENCE must be one of: primary, {', '.join(READ_PREFERENCE_MODES)}")
+    # MongoDB requires maxStalenessSeconds to be at least 90
+    return READ_PREFERENCE_MODES[mode](max_staleness=max(max_staleness, 90))
+
+# Helper function to build the write concern used by add_expense
+def build_expense_write_concern(w, journal):
+    return WriteConcern(w=int(w) if w.isdigit() else w, j=journal)
+
+try:
+    HEAVY_READ_PREFERENCE = build_heavy_read_preference(MONGO_HEAVY_READ_PREFERENCE, MONGO_MAX_STALENESS_S)
+    EXPENSE_WRITE_CONCERN = build_expense_write_concern(MONGO_EXPENSE_WRITE_W, MONGO_EXPENSE_WRITE_JOURNAL)
+except Exception as e:
+    logger.critical("MongoDB routing configuration error: %s", e)
+    exit(1)
+
+# Records how long requests wait to check a connection out of the pool
+class PoolMonitor(pymongo.monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+
+    def _adjust(self, field, amount):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_pool_size': MONGO_MAX_POOL_SIZE,
+                'min_pool_size': MONGO_MIN_POOL_SIZE,
+                'open_connections': self.open_connections,
+                'checked_out': self.checked_out,
+                'checkout_failures': self.checkout_failures
+            }
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._adjust('checked_out', 1)
+        started = getattr(self._local, 'started', None)
+        if started is not None:
+            metrics.observe('mongo.pool_wait_ms', (time.perf_counter() - started) * 1000)
+            self._local.started = None
+
+    def connection_check_out_failed(self, event):
+        self._adjust('checkout_failures', 1)
+        # Could not open a connection to the selected server; a full pool is not a failure
+        if event.reason == pymongo.monitoring.ConnectionCheckOutFailedReason.CONN_ERROR:
+            db_breaker.record_failure()
+        started = getattr(self._local, 'started', None)
+        if started is not None:
+            metrics.observe('mongo.pool_wait_ms', (time.perf_counter() - started) * 1000)
+            self._local.started = None
+
+    def connection_checked_in(self, event):
+        self._adjust('checked_out', -1)
+
+    def connection_created(self, event):
+        self._adjust('open_connections', 1)
+
+    def connection_closed(self, event):
+        self._adjust('open_connections', -1)
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+pool_monitor = PoolMonitor()
+
+# Slow-operation log: commands slower than SLOW_QUERY_MS are recorded with their
+# route, filter shape (values removed), duration and documents returned. A
+# sample of slow reads is explained in the background to show the index used.
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', 200))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1))
+
+# Fields of each read command that are kept to re-run it under explain
+EXPLAINABLE_FIELDS = {
+    'find': ['find', 'filter', 'sort', 'projection', 'skip', 'limit', 'hint'],
+    'aggregate': ['aggregate', 'pipeline', 'cursor', 'hint'],
+    'count': ['count', 'query', 'skip', 'limit', 'hint'],
+    'distinct': ['distinct', 'key', 'query']
+}
+
+# Helper function to replace every value in a filter with 1, keeping field names and operators
+def filter_shape(value):
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [filter_shape(item) for item in value]
+    return 1
+
+# Helper function to describe the filter of a command without its values
+def command_shape(name, command):
+    if name == 'find':
+        return filter_shape(command.get('filter', {}))
+    if name in ('count', 'distinct'):
+        return filter_shape(command.get('query', {}))
+    if name == 'aggregate':
+        return [
+            {stage: filter_shape(body) if stage == '$match' else 1}
+            for step in command.get('pipeline', []) for stage, body in step.items()
+        ]
+    if name in ('update', 'delete'):
+        statements = command.get('updates', command.get('deletes', []))
+        return [filter_shape(statement.get('q', {})) for statement in statements[:5]]
+    return None
+
+# Helper function to count the documents a command returned or touched
+def documents_returned(name, reply):
+    if 'cursor' in reply:
+        return len(reply['cursor'].get('firstBatch', reply['cursor'].get('nextBatch', [])))
+    if name == 'distinct':
+        return len(reply.get('values', []))
+    return reply.get('n')
+
+class SlowQueryLog:
+    def __init__(self, size):
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        # Worker threads are only spawned on the first submit
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+
+    def record(self, entry, explain_target=None):
+        with self._lock:
+            self._entries.append(entry)
+        logger.warning("Slow MongoDB operation", extra={key: entry[key] for key in ('command', 'collection', 'duration_ms', 'documents_returned')})
+        if explain_target is not None and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+            self._executor.submit(self._explain, entry, *explain_target)
+
+    def _explain(self, entry, database_name, command):
+        request_stats.explaining = True
+        try:
+            explain = mongo.cx[database_name].command({'explain': command, 'verbosity': 'queryPlanner'})
+            winning_plan = explain.get('queryPlanner', explain.get('stages', [{}])[0].get('$cursor', {}).get('queryPlanner', {})).get('winningPlan', {})
+            stages = collect_plan_stages(winning_plan)
+            entry['explain'] = {
+                'stages': stages,
+                'indexes': sorted(set(collect_plan_indexes(winning_plan))),
+                'uses_index': 'COLLSCAN' not in stages
+            }
+        except Exception as e:
+            entry['explain'] = {'error': str(e)}
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_LOG_SIZE)
+
+# Circuit breaker around MongoDB: after BREAKER_FAILURE_THRESHOLD consecutive
+# connection failures it opens, and requests stop waiting out the server
+# selection timeout. Reads are answered from the last snapshot and writes get an
+# immediate 503. After BREAKER_RESET_S one trial request is let through
+# (half-open); any successful command closes the breaker again.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 3))
+BREAKER_RESET_S = float(os.getenv('BREAKER_RESET_S', 30))
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_s):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if self.state == 'open' and now - self.opened_at >= self.reset_s:
+                self.state = 'half_open'
+                self.trial_started = now
+                return True
+            # A trial that never reached the database does not block recovery
+            if self.state == 'half_open' and now - self.trial_started >= self.reset_s:
+                self.trial_started = now
+                return True
+            return False
+
+    def record_success(self):
+        if self.state == 'closed' and self.failures == 0:
+            return
+        with self._lock:
+            if self.state != 'closed':
+                logger.warning("MongoDB reachable again, circuit breaker closed")
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                if self.state == 'closed':
+                    logger.error("MongoDB unreachable, circuit breaker open", extra={'consecutive_failures': self.failures})
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                metrics.increment('breaker.opened')
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'open_for_s': round(time.monotonic() - self.opened_at, 1) if self.state != 'closed' else 0
+        }
+
+db_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_S)
+
+# Connection failures are counted where pymongo reports them, rather than in
+# each route's except block: failed commands, failed pool check-outs and, while
+# no writable server is known (requests are waiting out server selection,
+# which issues no command), failed heartbeats.
+
+# Helper function to tell a failed command's client-side connection error
+# (reported with an errtype) from an error reply sent by the server
+def is_connection_failure(failure):
+    error_type = getattr(pymongo.errors, failure.get('errtype', ''), None)
+    return isinstance(error_type, type) and issubclass(error_type, pymongo.errors.ConnectionFailure)
+
+class TopologyMonitor(pymongo.monitoring.ServerHeartbeatListener, pymongo.monitoring.TopologyListener):
+    def __init__(self):
+        self.writable = False
+
+    def opened(self, event):
+        pass
+
+    def description_changed(self, event):
+        self.writable = event.new_description.has_writable_server()
+
+    def closed(self, event):
+        pass
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        # A secondary going away while the primary answers is not an outage
+        if not self.writable:
+            db_breaker.record_failure()
+
+topology_monitor = TopologyMonitor()
+
+class CommandMonitor(pymongo.monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        if getattr(request_stats, 'active', False):
+            request_stats.round_trips += 1
+        if getattr(request_stats, 'explaining', False):
+            return
+        # Only a reference is kept here; the shape is built once a command turns out slow
+        self._pending[(event.connection_id, event.request_id)] = (
+            event.command, getattr(request_stats, 'route', None) or 'background'
+        )
+
+    def succeeded(self, event):
+        db_breaker.record_success()
+        started = self._pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        duration_ms = event.duration_micros / 1000.0
+        if duration_ms < SLOW_QUERY_MS:
+            return
+        
+        command, route = started
+        collection = command.get(event.command_name)
+        entry = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'route': route,
+            'command': event.command_name,
+            'collection': collection if isinstance(collection, str) else command.get('collection'),
+            'filter_shape': command_shape(event.command_name, command),
+            'duration_ms': round(duration_ms, 2),
+            'documents_returned': documents_returned(event.command_name, event.reply)
+        }
+        explain_target = None
+        if event.command_name in EXPLAINABLE_FIELDS:
+            explain_target = (event.database_name, {
+                field: command[field] for field in EXPLAINABLE_FIELDS[event.command_name] if field in command
+            })
+        slow_query_log.record(entry, explain_target)
+
+    def failed(self, event):
+        self._pending.pop((event.connection_id, event.request_id), None)
+        if is_connection_failure(event.failure):
+            db_breaker.record_failure()
+
+command_monitor = CommandMonitor()
 
 try:
     # Initialize PyMongo with connectTimeoutMS and serverSelectionTimeoutMS
-    mongo = PyMongo(app, connectTimeoutMS=5000, serverSelectionTimeoutMS=5000)
+    mongo = PyMongo(
+        app,
+        connectTimeoutMS=5000,
+        serverSelectionTimeoutMS=5000,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        event_listeners=[pool_monitor, command_monitor, topology_monitor]
+    )
     
     # Explicitly get the client and database to test connection
     client = mongo.cx
@@ -33,36 +595,102 @@ try:
     
     # Test the connection
     db.command('ping')
-    print("MongoDB Atlas connected successfully!")
+    logger.info("MongoDB Atlas connected successfully")
     
     # Create index for better performance (optional)
     try:
         db.expenses.create_index([("created_at", -1)])
         db.expenses.create_index([("paid_by", 1)])
-        print("Database indexes created")
+        # Indexes backing the GET /expenses filters
+        db.expenses.create_index([("paid_by", 1), ("created_at", -1)])
+        db.expenses.create_index([("participants.person", 1), ("created_at", -1)])
+        db.expenses.create_index([("split_type", 1), ("created_at", -1)])
+        db.expenses.create_index([("amount", 1)])
+        db.expenses.create_index([("description", "text")])
+        # Indexes for listing one person's pairwise debts
+        db.debts.create_index([("debtor", 1)])
+        db.debts.create_index([("creditor", 1)])
+        # Settle-up checkpoints and archived expenses
+        db.checkpoints.create_index([("created_at", -1)])
+        db.checkpoints.create_index([("previous_checkpoint_id", 1)], unique=True)
+        db.expenses.create_index([("checkpoint_id", 1)], sparse=True)
+        db.expenses_archive.create_index([("checkpoint_id", 1)])
+        # Spend rollups: per-person series and top-k leaderboards
+        db.spend_rollups.create_index([("person", 1), ("granularity", 1), ("bucket", 1)])
+        db.spend_rollups.create_index([("granularity", 1), ("bucket", 1), ("paid", -1)])
+        logger.info("Database indexes created")
     except Exception as e:
-        print(f"Index creation warning: {e}")
+        logger.warning("Index creation warning: %s", e)
         
 except pymongo.errors.ConfigurationError as e:
-    print(f"MongoDB configuration error: {e}")
-    print("Please check your MONGO_URI format")
+    logger.critical("MongoDB configuration error: %s; check your MONGO_URI format", e)
     exit(1)
 except pymongo.errors.ConnectionFailure as e:
-    print(f"MongoDB connection failed: {e}")
-    print("Please check:")
-    print("1. Your internet connection")
-    print("2. MongoDB Atlas cluster is running")
-    print("3. IP address is whitelisted in Atlas")
-    print("4. Username and password are correct")
+    logger.critical(
+        "MongoDB connection failed: %s; check your internet connection, that the Atlas cluster is running, "
+        "that this IP address is whitelisted and that the username and password are correct", e
+    )
     exit(1)
 except Exception as e:
-    print(f"Unexpected error connecting to MongoDB: {e}")
+    logger.critical("Unexpected error connecting to MongoDB: %s", e)
     exit(1)
 
-# Helper function to serialize MongoDB documents
+# Expenses collection for heavy reads, which may be served by secondaries
+def read_expenses():
+    return mongo.db.expenses.with_options(read_preference=HEAVY_READ_PREFERENCE)
+
+# Expenses collection for inserts, using the configured write concern
+def write_expenses():
+    return mongo.db.expenses.with_options(write_concern=EXPENSE_WRITE_CONCERN)
+
+# MessagePack is offered as a negotiated alternative to JSON for native clients.
+# Datetimes use the msgpack Timestamp extension and ObjectIds their own
+# extension type carrying the 12 raw bytes.
+MSGPACK_MIMETYPE = 'application/msgpack'
+MSGPACK_OBJECTID_EXT = 1
+
+# Helper function to check whether the client asked for a MessagePack response
+def wants_msgpack():
+    if not has_request_context():
+        return False
+    return request.accept_mimetypes.best_match(['application/json', MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE
+
+# Helper function to encode the types msgpack does not know natively
+def msgpack_default(value):
+    if isinstance(value, ObjectId):
+        return msgpack.ExtType(MSGPACK_OBJECTID_EXT, value.binary)
+    if isinstance(value, datetime):
+        # Stored datetimes are naive UTC
+        return msgpack.Timestamp.from_datetime(value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    raise TypeError(f'Cannot serialize {type(value).__name__} to MessagePack')
+
+# Helper function to decode ObjectIds sent by msgpack clients
+def msgpack_ext_hook(code, data):
+    if code == MSGPACK_OBJECTID_EXT:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+# Helper function to build a JSON or MessagePack response depending on the Accept header
+def api_response(payload):
+    if wants_msgpack():
+        return Response(msgpack.packb(payload, default=msgpack_default), mimetype=MSGPACK_MIMETYPE)
+    return jsonify(payload)
+
+# Helper function to read a JSON or MessagePack request body (None if missing or invalid)
+def request_body(silent=False):
+    if request.mimetype == MSGPACK_MIMETYPE:
+        try:
+            return msgpack.unpackb(request.get_data(), ext_hook=msgpack_ext_hook, timestamp=3)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError):
+            return None
+    return request.get_json(silent=silent)
+
+# Helper function to serialize MongoDB documents (msgpack responses keep native ObjectId and datetime values)
 def serialize_doc(doc):
     if doc is None:
         return None
+    if wants_msgpack():
+        return doc
     if '_id' in doc:
         doc['_id'] = str(doc['_id'])
     if 'created_at' in doc:
@@ -154,17 +782,303 @@ def validate_expense_data(data, is_update=False):
     
     return errors
 
+# Fields that determine an expense's split_amounts
+SPLIT_FIELDS = {'amount', 'paid_by', 'split_type', 'participants'}
+
+# Helper function to build the $set document for a validated update
+def build_update_data(data):
+    update_data = {'updated_at': datetime.utcnow()}
+    
+    if 'amount' in data:
+        update_data['amount'] = float(data['amount'])
+    if 'description' in data:
+        update_data['description'] = data['description'].strip()
+    if 'paid_by' in data:
+        update_data['paid_by'] = data['paid_by'].strip()
+    if 'split_type' in data:
+        update_data['split_type'] = data['split_type']
+    if 'participants' in data:
+        update_data['participants'] = data['participants']
+    
+    return update_data
+
+# Expenses carry a version that every write increments. It is exposed as the
+# ETag of PUT/POST responses so clients can send If-Match for optimistic
+# concurrency; documents written before versioning count as version 0.
+def expense_version(expense):
+    return expense.get('version', 0)
+
+# Helper function to match a specific version of an expense
+def version_filter(version):
+    if version == 0:
+        return {'version': {'$exists': False}}
+    return {'version': version}
+
+# Helper function to read the expected version from If-Match (None when absent or '*')
+def parse_if_match():
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    versions = [int(tag) for tag in request.if_match.as_set() if tag.isdigit()]
+    if len(versions) != 1:
+        raise BadRequest('If-Match must contain a single expense version')
+    return versions[0]
+
+# Helper function to attach an expense's version as the response ETag
+def with_etag(response, expense):
+    response.set_etag(str(expense_version(expense)))
+    return response
+
+# Helper function to parse an ISO 8601 date/datetime query parameter
+def parse_iso_datetime(value):
+    if value.endswith('Z'):
+        value = value[:-1]
+    return datetime.fromisoformat(value)
+
+# Helper function to build a MongoDB filter from GET /expenses query parameters
+def build_expense_filter(args):
+    query = {}
+    errors = []
+    
+    for field in ['paid_by', 'split_type']:
+        if args.get(field):
+            query[field] = args[field].strip()
+    
+    if args.get('participant'):
+        query['participants.person'] = args['participant'].strip()
+    
+    amount_range = {}
+    for param, operator in [('min_amount', '$gte'), ('max_amount', '$lte')]:
+        if args.get(param):
+            try:
+                amount_range[operator] = float(args[param])
+            except ValueError:
+                errors.append(f"{param} must be a number")
+    if amount_range:
+        query['amount'] = amount_range
+    
+    date_range = {}
+    for param in ['start_date', 'end_date']:
+        if args.get(param):
+            value = args[param].strip()
+            try:
+                parsed = parse_iso_datetime(value)
+            except ValueError:
+                errors.append(f"{param} must be an ISO 8601 date or datetime")
+                continue
+            if param == 'start_date':
+                date_range['$gte'] = parsed
+            elif len(value) == 10:
+                # A bare end date includes the whole of that day
+                date_range['$lt'] = parsed + timedelta(days=1)
+            else:
+                date_range['$lte'] = parsed
+    if date_range:
+        query['created_at'] = date_range
+    
+    if args.get('q'):
+        query['$text'] = {'$search': args['q']}
+    
+    return query, errors
+
+# Helper function to collect the stage names of a query plan
+def collect_plan_stages(plan):
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for key in ['inputStage', 'queryPlan']:
+            stages.extend(collect_plan_stages(plan.get(key)))
+        for child in plan.get('inputStages', []):
+            stages.extend(collect_plan_stages(child))
+    return stages
+
+# Helper function to collect the index names used by a query plan
+def collect_plan_indexes(plan):
+    indexes = []
+    if isinstance(plan, dict):
+        if 'indexName' in plan:
+            indexes.append(plan['indexName'])
+        for key in ['inputStage', 'queryPlan']:
+            indexes.extend(collect_plan_indexes(plan.get(key)))
+        for child in plan.get('inputStages', []):
+            indexes.extend(collect_plan_indexes(child))
+    return indexes
+
+# Helper function to explain an expense query and check it used one of the
+# expected indexes without examining documents it then threw away. The query is
+# explained without GET /expenses' created_at sort, which the planner could
+# otherwise satisfy by walking created_at_-1 for any filter.
+def explain_expense_filter(query, expected_indexes):
+    explain = mongo.db.expenses.find(query).explain()
+    winning_plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+    execution = explain.get('executionStats', {})
+    stages = collect_plan_stages(winning_plan)
+    indexes = collect_plan_indexes(winning_plan)
+    docs_examined = execution.get('totalDocsExamined', 0)
+    returned = execution.get('nReturned', 0)
+    return {
+        'stages': stages,
+        'indexes': indexes,
+        'expected_indexes': sorted(expected_indexes),
+        'docs_examined': docs_examined,
+        'returned': returned,
+        'uses_index': 'COLLSCAN' not in stages and bool(expected_indexes & set(indexes)) and docs_examined <= returned
+    }
+
+# Representative filter shapes supported by GET /expenses, with the indexes
+# (by MongoDB's default names) that are expected to serve them
+EXPENSE_FILTER_SHAPES = {
+    'paid_by': ({'paid_by': 'Shantanu'}, {'paid_by_1', 'paid_by_1_created_at_-1'}),
+    'participant': ({'participant': 'Sanket'}, {'participants.person_1_created_at_-1'}),
+    'split_type': ({'split_type': 'percentage'}, {'split_type_1_created_at_-1'}),
+    'amount_range': ({'min_amount': '100', 'max_amount': '500'}, {'amount_1'}),
+    'date_range': ({'start_date': '2024-01-01', 'end_date': '2030-01-01'}, {'created_at_-1'}),
+    'text': ({'q': 'dinner'}, {'description_text'}),
+    'paid_by_and_date_range': ({'paid_by': 'Shantanu', 'start_date': '2024-01-01'}, {'paid_by_1_created_at_-1'})
+}
+
+# Helper function to parse page/page_size query parameters
+def parse_pagination(args, default_page_size=50, max_page_size=500):
+    errors = []
+    try:
+        page = int(args.get('page', 1))
+        if page < 1:
+            errors.append("page must be at least 1")
+    except ValueError:
+        page = 1
+        errors.append("page must be an integer")
+    try:
+        page_size = int(args.get('page_size', default_page_size))
+        if page_size < 1 or page_size > max_page_size:
+            errors.append(f"page_size must be between 1 and {max_page_size}")
+    except ValueError:
+        page_size = default_page_size
+        errors.append("page_size must be an integer")
+    return page, page_size, errors
+
+# Helper function to match only the expenses that affect one person's balance.
+# Equal splits are shared by every payer, so a payer also sees all equal splits.
+def person_expense_match(person, is_payer):
+    conditions = [{'paid_by': person}, {'participants.person': person}]
+    if is_payer:
+        conditions.append({'split_type': 'equal'})
+    return {'$or': conditions}
+
+# Helper function to build the aggregation expression for what one person owes on an expense.
+# Stored split_amounts are summed directly; older documents fall back to the split rules.
+def person_owed_expression(person, num_payers, is_payer):
+    stored_amount = {
+        '$sum': {
+            '$map': {
+                'input': {'$filter': {'input': '$split_amounts', 'cond': {'$eq': ['$$this.person', person]}}},
+                'in': '$$this.amount'
+            }
+        }
+    }
+    return {
+        '$cond': [
+            {'$isArray': '$split_amounts'},
+            stored_amount,
+            computed_owed_expression(person, num_payers, is_payer)
+        ]
+    }
+
+# Helper function to compute what one person owes from the split rules in an aggregation
+def computed_owed_expression(person, num_payers, is_payer):
+    equal_share = {'$divide': ['$amount', num_payers]} if is_payer and num_payers else 0
+    return {
+        '$let': {
+            'vars': {
+                'matched': {
+                    '$filter': {
+                        'input': {'$ifNull': ['$participants', []]},
+                        'cond': {'$eq': ['$$this.person', person]}
+                    }
+                }
+            },
+            'in': {
+                '$switch': {
+                    'branches': [
+                        {'case': {'$eq': ['$split_type', 'equal']}, 'then': equal_share},
+                        {'case': {'$eq': ['$split_type', 'percentage']},
+                         'then': {'$divide': [{'$multiply': ['$amount', {'$sum': '$$matched.percentage'}]}, 100]}},
+                        {'case': {'$eq': ['$split_type', 'exact']},
+                         'then': {'$sum': '$$matched.amount'}},
+                        {'case': {'$eq': ['$split_type', 'shares']},
+                         'then': {'$cond': [
+                             {'$gt': [{'$sum': '$participants.shares'}, 0]},
+                             {'$divide': [{'$multiply': ['$amount', {'$sum': '$$matched.shares'}]}, {'$sum': '$participants.shares'}]},
+                             0
+                         ]}}
+                    ],
+                    'default': 0
+                }
+            }
+        }
+    }
+
+# Settle-up checkpoints: a settle-up first claims expenses by tagging them with
+# the pending checkpoint's ID, then records cumulative balances, debt edges and
+# payers for exactly the claimed set and marks the checkpoint complete. Claimed
+# expenses are moved to expenses_archive, and balance computations start from
+# the latest complete checkpoint plus the expenses it did not claim.
+CHECKPOINT_CACHE_S = float(os.getenv('CHECKPOINT_CACHE_S', 5))
+# A pending settle-up older than this is assumed to have crashed and is rolled back
+SETTLE_UP_TIMEOUT_S = 600
+
+checkpoint_cache = {'checkpoint': None, 'fetched_at': None}
+
+# Helper function to load the latest complete checkpoint. Writes pass cached=True
+# and reuse a copy up to CHECKPOINT_CACHE_S old instead of a round trip each
+def get_latest_checkpoint(cached=False):
+    fetched_at = checkpoint_cache['fetched_at']
+    if cached and fetched_at is not None and time.monotonic() - fetched_at < CHECKPOINT_CACHE_S:
+        return checkpoint_cache['checkpoint']
+    
+    checkpoint = mongo.db.checkpoints.find_one({'state': {'$ne': 'pending'}}, sort=[('created_at', -1)])
+    checkpoint_cache.update(checkpoint=checkpoint, fetched_at=time.monotonic())
+    return checkpoint
+
+# Helper function to drop the cached checkpoint after a settle-up in this process
+def invalidate_checkpoint_cache():
+    checkpoint_cache.update(checkpoint=None, fetched_at=None)
+
+# Helper function to match expenses not yet counted in a checkpoint's balances.
+# Only the latest checkpoint's expenses can still be waiting to be archived.
+def hot_expense_filter(checkpoint):
+    if checkpoint is None:
+        return {}
+    return {'checkpoint_id': {'$ne': checkpoint['_id']}}
+
+# Writes only match expenses no settle-up has claimed
+UNCLAIMED_FILTER = {'checkpoint_id': {'$exists': False}}
+
+# Default for get_payers() when the caller has not already loaded the checkpoint
+LATEST_CHECKPOINT = object()
+
+# Helper function to check that no settle-up has claimed an expense
+def is_unsettled(expense):
+    return 'checkpoint_id' not in expense
+
+# Helper function to list everyone who has paid for an expense (uses the paid_by index),
+# including payers whose expenses have been archived by a checkpoint
+def get_payers(expenses=None, checkpoint=LATEST_CHECKPOINT):
+    expenses = mongo.db.expenses if expenses is None else expenses
+    if checkpoint is LATEST_CHECKPOINT:
+        checkpoint = get_latest_checkpoint()
+    payers = set(expenses.distinct('paid_by'))
+    if checkpoint is not None:
+        payers.update(checkpoint['payers'])
+    return sorted(payers)
+
 # Helper function to calculate individual amounts based on split type
-def calculate_individual_amounts(expense):
+def calculate_individual_amounts(expense, payers=None):
     split_type = expense.get('split_type', 'equal')
     total_amount = float(expense['amount'])
     
     if split_type == 'equal':
-        # Get all people involved in the expense
-        all_expenses = list(mongo.db.expenses.find())
-        all_people = set()
-        for exp in all_expenses:
-            all_people.add(exp['paid_by'])
+        # Equal splits are divided among everyone who has paid for an expense
+        all_people = set(get_payers() if payers is None else payers)
         
         num_people = len(all_people)
         if num_people == 0:
@@ -205,99 +1119,1070 @@ def calculate_individual_amounts(expense):
     
     return {}
 
-# Helper function to calculate settlements with enhanced logic
-def calculate_settlements():
+# Helper function to compute the per-person owed amounts stored on an expense
+# as split_amounts, so reads can sum them instead of re-running the split logic
+def materialize_split_amounts(expense, payers=None):
+    if expense.get('split_type', 'equal') == 'equal' and payers is None:
+        payers = set(get_payers(checkpoint=get_latest_checkpoint(cached=True))) | {expense['paid_by']}
+    amounts = calculate_individual_amounts(expense, payers)
+    return [{'person': person, 'amount': amount} for person, amount in amounts.items()]
+
+# Helper function to read the per-person owed amounts of an expense, falling
+# back to computing them for documents written before split_amounts existed
+def expense_split_amounts(expense):
+    if 'split_amounts' not in expense:
+        return calculate_individual_amounts(expense)
+    return stored_split_amounts(expense)
+
+# Fields read when re-dividing equal splits, enough to diff derived data
+REFRESH_PROJECTION = {'created_at': 1, 'paid_by': 1, 'amount': 1, 'split_type': 1, 'split_amounts': 1}
+
+# Helper function to re-divide every equal split after the payer set changes.
+# Returns (old, new) pairs for the rewritten expenses so the debt matrix and
+# rollups can apply their deltas instead of being rebuilt.
+def refresh_equal_split_amounts(payers=None, batch_size=500):
+    checkpoint = get_latest_checkpoint()
+    payers = sorted(get_payers(checkpoint=checkpoint) if payers is None else payers)
+    if not payers:
+        return []
+    changes = []
+    operations = []
+    # Expenses claimed by a settle-up keep the split they were settled with
+    for expense in mongo.db.expenses.find({'split_type': 'equal', **UNCLAIMED_FILTER}, REFRESH_PROJECTION, batch_size=batch_size):
+        split_amounts = [{'person': person, 'amount': expense['amount'] / len(payers)} for person in payers]
+        if expense.get('split_amounts') == split_amounts:
+            continue
+        # Matching on amount leaves an expense alone if a concurrent update re-split it
+        operations.append(UpdateOne(
+            {'_id': expense['_id'], 'amount': expense['amount'], 'split_type': 'equal', **UNCLAIMED_FILTER},
+            {'$set': {'split_amounts': split_amounts}}
+        ))
+        changes.append((expense, {**expense, 'split_amounts': split_amounts}))
+        if len(operations) >= batch_size:
+            mongo.db.expenses.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        mongo.db.expenses.bulk_write(operations, ordered=False)
+    return changes
+
+# Backfill split_amounts on existing documents (flask --app app backfill-split-amounts)
+def backfill_split_amounts(batch_size=500, recompute=False):
+    payers = set(get_payers())
+    query = {} if recompute else {'split_amounts': {'$exists': False}}
+    operations = []
+    updated = 0
+    
+    for expense in mongo.db.expenses.find(query, batch_size=batch_size):
+        operations.append(UpdateOne(
+            {'_id': expense['_id']},
+            {'$set': {'split_amounts': materialize_split_amounts(expense, payers)}}
+        ))
+        if len(operations) >= batch_size:
+            updated += mongo.db.expenses.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    
+    if operations:
+        updated += mongo.db.expenses.bulk_write(operations, ordered=False).modified_count
+    return updated
+
+@app.cli.command('backfill-split-amounts')
+@click.option('--recompute', is_flag=True, help='Recompute split_amounts on every document, not only missing ones')
+def backfill_split_amounts_command(recompute):
+    updated = backfill_split_amounts(recompute=recompute)
+    click.echo(f"Backfilled split_amounts on {updated} expenses")
+
+# Pairwise debt matrix: one document per (debtor, creditor) pair holding the
+# gross amount the debtor owes the creditor, maintained incrementally on write.
+def debt_key(debtor, creditor):
+    return {'debtor': debtor, 'creditor': creditor}
+
+# Helper function to list the (debtor, creditor) edges created by one expense
+def expense_debt_edges(expense):
+    edges = {}
+    if expense is None:
+        return edges
+    payer = expense['paid_by']
+    for person, amount in expense_split_amounts(expense).items():
+        if person != payer and amount:
+            edges[(person, payer)] = edges.get((person, payer), 0) + amount
+    return edges
+
+# Helper function to check whether a write added or removed a payer. Equal splits
+# are divided among all payers, so this changes every equal-split edge.
+def payer_set_changed(old_expense, new_expense):
+    old_payer = old_expense['paid_by'] if old_expense else None
+    new_payer = new_expense['paid_by'] if new_expense else None
+    if old_payer == new_payer:
+        return False
+    checkpoint = get_latest_checkpoint(cached=True)
+    archived_payers = set(checkpoint['payers']) if checkpoint else set()
+    if new_payer is not None and new_payer not in archived_payers \
+            and mongo.db.expenses.count_documents({'paid_by': new_payer}, limit=2) == 1:
+        return True
+    if old_payer is not None and old_payer not in archived_payers \
+            and mongo.db.expenses.find_one({'paid_by': old_payer}, {'_id': 1}) is None:
+        return True
+    return False
+
+# Ledger passes stream a projected cursor: only the fields balances and debts
+# depend on are fetched, in batches, so memory stays flat as history grows
+LEDGER_BATCH_SIZE = int(os.getenv('LEDGER_BATCH_SIZE', 2000))
+LEDGER_PROJECTION = {
+    '_id': 0, 'paid_by': 1, 'amount': 1, 'split_type': 1, 'participants': 1, 'split_amounts': 1
+}
+
+# Helper function to replace a derived collection in one step: documents are
+# written to a staging collection carrying the same indexes, which is then
+# renamed over the original, so readers never see it empty or half built
+def swap_in_collection(name, documents, batch_size=1000):
+    target = mongo.db[name]
+    staging = mongo.db[f'{name}_rebuild']
+    staging.drop()
+    mongo.db.create_collection(staging.name)
+    for index_name, spec in target.index_information().items():
+        if index_name != '_id_':
+            staging.create_index(spec['key'], name=index_name, unique=spec.get('unique', False))
+    
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            staging.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        staging.insert_many(batch, ordered=False)
+    staging.rename(name, dropTarget=True)
+
+# Rebuilds and incremental deltas of the debt matrix are serialized, so a delta
+# applied while a rebuild is scanning cannot be dropped by the swap or counted
+# twice. This covers one process; run admin rebuilds when writes are quiet.
+debt_matrix_lock = threading.Lock()
+
+# Helper function to rebuild the debt matrix from the latest checkpoint and newer expenses
+def rebuild_debt_matrix():
+    with debt_matrix_lock:
+        checkpoint = get_latest_checkpoint()
+        edges = {}
+        if checkpoint is not None:
+            for edge in checkpoint['debts']:
+                edges[(edge['debtor'], edge['creditor'])] = edge['amount']
+        
+        for expense in mongo.db.expenses.find(hot_expense_filter(checkpoint), LEDGER_PROJECTION, batch_size=LEDGER_BATCH_SIZE):
+            for pair, amount in expense_debt_edges(expense).items():
+                edges[pair] = edges.get(pair, 0) + amount
+        
+        swap_in_collection('debts', (
+            {'_id': debt_key(debtor, creditor), 'debtor': debtor, 'creditor': creditor, 'amount': amount}
+            for (debtor, creditor), amount in edges.items()
+        ))
+        return len(edges)
+
+# Helper function to add the debt delta of one expense write (old -> new) to delta
+def add_debt_delta(delta, old_expense, new_expense):
+    for pair, amount in expense_debt_edges(new_expense).items():
+        delta[pair] = delta.get(pair, 0) + amount
+    for pair, amount in expense_debt_edges(old_expense).items():
+        delta[pair] = delta.get(pair, 0) - amount
+    return delta
+
+# Helper function to apply the combined debt delta of expense writes, given as
+# (old, new) pairs, including any equal splits they caused to be re-divided
+def update_debt_matrix(changes):
+    delta = {}
+    for old_expense, new_expense in changes:
+        add_debt_delta(delta, old_expense, new_expense)
+    
+    operations = [
+        UpdateOne(
+            {'_id': debt_key(debtor, creditor)},
+            {'$inc': {'amount': amount}, '$setOnInsert': {'debtor': debtor, 'creditor': creditor}},
+            upsert=True
+        )
+        for (debtor, creditor), amount in delta.items() if abs(amount) > 1e-9
+    ]
+    if operations:
+        with debt_matrix_lock:
+            mongo.db.debts.bulk_write(operations, ordered=False)
+
+# Spend rollups: one document per (person, granularity, bucket) holding what the
+# person paid, their share of expenses (owes) and how many expenses they paid,
+# bucketed by created_at. Maintained incrementally on write like the debt
+# matrix, and archived expenses stay counted so charts keep their history.
+ROLLUP_GRANULARITIES = {'day': '%Y-%m-%d', 'month': '%Y-%m', 'all': None}
+ROLLUP_PROJECTION = {
+    '_id': 0, 'created_at': 1, 'paid_by': 1, 'amount': 1, 'split_type': 1, 'participants': 1, 'split_amounts': 1
+}
+
+def rollup_key(person, granularity, bucket):
+    return {'person': person, 'granularity': granularity, 'bucket': bucket}
+
+# Helper function to name the bucket an expense falls in for each granularity
+def rollup_buckets(expense):
+    return {
+        granularity: expense['created_at'].strftime(bucket_format) if bucket_format else 'all'
+        for granularity, bucket_format in ROLLUP_GRANULARITIES.items()
+    }
+
+# Helper function to add one expense's contribution (times sign) to rollup totals
+def add_rollup_contribution(totals, expense, sign=1):
+    if expense is None:
+        return totals
+    for granularity, bucket in rollup_buckets(expense).items():
+        payer = totals.setdefault((expense['paid_by'], granularity, bucket), {'paid': 0, 'owes': 0, 'expense_count': 0})
+        payer['paid'] += sign * float(expense['amount'])
+        payer['expense_count'] += sign
+        for person, amount in expense_split_amounts(expense).items():
+            share = totals.setdefault((person, granularity, bucket), {'paid': 0, 'owes': 0, 'expense_count': 0})
+            share['owes'] += sign * amount
+    return totals
+
+# Rebuilds and incremental deltas of the rollups are serialized like the debt matrix's
+spend_rollups_lock = threading.Lock()
+
+# Helper function to rebuild every rollup from live and archived expenses. Only
+# run from the CLI: it scans the archive, and the rebuilt rollups replace the
+# collection in one rename so readers never see it empty or half-filled.
+def rebuild_spend_rollups():
+    with spend_rollups_lock:
+        totals = {}
+        for collection in [mongo.db.expenses_archive, mongo.db.expenses]:
+            for expense in collection.find({}, ROLLUP_PROJECTION, batch_size=LEDGER_BATCH_SIZE):
+                add_rollup_contribution(totals, expense)
+        
+        swap_in_collection('spend_rollups', (
+            {'_id': rollup_key(person, granularity, bucket), 'person': person, 'granularity': granularity, 'bucket': bucket, **values}
+            for (person, granularity, bucket), values in totals.items()
+        ))
+        return len(totals)
+
+# Helper function to apply the combined rollup delta of expense writes, given as
+# (old, new) pairs, including any equal splits they caused to be re-divided
+def update_spend_rollups(changes):
+    delta = {}
+    for old_expense, new_expense in changes:
+        add_rollup_contribution(add_rollup_contribution(delta, new_expense), old_expense, sign=-1)
+    operations = [
+        UpdateOne(
+            {'_id': rollup_key(person, granularity, bucket)},
+            {'$inc': values, '$setOnInsert': {'person': person, 'granularity': granularity, 'bucket': bucket}},
+            upsert=True
+        )
+        for (person, granularity, bucket), values in delta.items()
+        if any(abs(value) > 1e-9 for value in values.values())
+    ]
+    if operations:
+        with spend_rollups_lock:
+            mongo.db.spend_rollups.bulk_write(operations, ordered=False)
+
+@app.cli.command('rebuild-spend-rollups')
+def rebuild_spend_rollups_command():
+    count = rebuild_spend_rollups()
+    click.echo(f"Rebuilt {count} spend rollup documents")
+
+# Called after every expense insert (old=None), update or delete (new=None)
+# to keep derived data in sync with the expenses collection
+def apply_expense_change(old_expense, new_expense):
+    try:
+        payers_changed = payer_set_changed(old_expense, new_expense)
+    except Exception as e:
+        logger.error("Error checking for payer changes: %s", e)
+        payers_changed = False
+    apply_expense_changes([(old_expense, new_expense)], payers_changed)
+
+# Batch form of apply_expense_change: derived data for several writes, given as
+# (old, new) pairs, is updated with one delta per derived collection.
+# payers_changed says whether the writes added or removed a payer.
+def apply_expense_changes(changes, payers_changed=False):
+    invalidate_ledger()
+    if settlements_precomputer is not None:
+        settlements_precomputer.mark_dirty()
+    refreshed = []
+    if payers_changed:
+        try:
+            refreshed = refresh_equal_split_amounts()
+        except Exception as e:
+            logger.error("Error refreshing equal split amounts: %s", e)
+    payers_changed = bool(refreshed)
+    
+    try:
+        update_debt_matrix(changes + refreshed)
+    except Exception as e:
+        logger.error("Error updating debt matrix: %s", e)
+    
+    try:
+        update_spend_rollups(changes + refreshed)
+    except Exception as e:
+        logger.error("Error updating spend rollups: %s", e)
+    
+    for old_expense, new_expense in changes:
+        note_balance_change(old_expense, new_expense, payers_changed)
+
+# Helper function to build the ledger for all expenses, starting from the latest checkpoint
+def compute_ledger():
+    checkpoint = get_latest_checkpoint()
+    payers = []
+    
+    def split_amounts(expense):
+        if 'split_amounts' in expense:
+            return stored_split_amounts(expense)
+        # Documents written before split_amounts existed
+        if not payers:
+            payers.extend(get_payers(checkpoint=checkpoint))
+        return calculate_individual_amounts(expense, payers)
+    
+    ledger = Ledger(split_amounts)
+    if checkpoint is not None:
+        ledger.add_opening_balances(checkpoint['balances'], checkpoint['total_amount'], checkpoint['expense_count'])
+    return ledger.add_all(read_expenses().find(hot_expense_filter(checkpoint), LEDGER_PROJECTION, batch_size=LEDGER_BATCH_SIZE))
+
+# Raised when another settle-up is already running
+class SettleUpInProgress(Exception):
+    pass
+
+# Helper function to insert a pending checkpoint. The unique index on
+# previous_checkpoint_id lets only one settle-up build on a given checkpoint.
+def claim_checkpoint(previous):
+    claim = {
+        '_id': ObjectId(),
+        'state': 'pending',
+        'created_at': datetime.utcnow(),
+        'previous_checkpoint_id': previous['_id'] if previous else None
+    }
+    try:
+        mongo.db.checkpoints.insert_one(claim)
+        return claim
+    except pymongo.errors.DuplicateKeyError:
+        pass
+    
+    stuck = mongo.db.checkpoints.find_one({'previous_checkpoint_id': claim['previous_checkpoint_id'], 'state': 'pending'})
+    if stuck is None or (datetime.utcnow() - stuck['created_at']).total_seconds() < SETTLE_UP_TIMEOUT_S:
+        raise SettleUpInProgress('Another settle-up is in progress')
+    release_checkpoint_claim(stuck)
+    mongo.db.checkpoints.insert_one(claim)
+    return claim
+
+# Helper function to abandon a pending checkpoint and untag the expenses it claimed
+def release_checkpoint_claim(claim):
+    mongo.db.expenses.update_many({'checkpoint_id': claim['_id']}, {'$unset': {'checkpoint_id': ''}})
+    mongo.db.checkpoints.delete_one({'_id': claim['_id'], 'state': 'pending'})
+
+# Helper function to record a settle-up checkpoint and archive the expenses it covers
+def create_checkpoint(batch_size=1000):
+    previous = get_latest_checkpoint()
+    if previous is not None:
+        # Finish an archive pass an earlier settle-up did not complete
+        archive_covered_expenses(previous, batch_size)
+    
+    claim = claim_checkpoint(previous)
     try:
-        expenses = list(mongo.db.expenses.find())
+        # Tag every unclaimed expense; from here on writes cannot change them, and
+        # an insert that commits later stays unclaimed however old its created_at
+        mongo.db.expenses.update_many(UNCLAIMED_FILTER, {'$set': {'checkpoint_id': claim['_id']}})
         
-        if not expenses:
-            return []
+        ledger = Ledger(expense_split_amounts)
+        edges = {}
+        payers = set()
+        if previous is not None:
+            ledger.add_opening_balances(previous['balances'], previous['total_amount'], previous['expense_count'])
+            edges = {(edge['debtor'], edge['creditor']): edge['amount'] for edge in previous['debts']}
+            payers.update(previous['payers'])
         
-        # Calculate what each person owes and what they paid
-        balances = {}
+        claimed_count = 0
+        covered_through = None
+        for expense in mongo.db.expenses.find({'checkpoint_id': claim['_id']}, {**LEDGER_PROJECTION, 'created_at': 1}, batch_size=batch_size):
+            claimed_count += 1
+            covered_through = max(covered_through or expense['created_at'], expense['created_at'])
+            ledger.add(expense)
+            payers.add(expense['paid_by'])
+            for pair, amount in expense_debt_edges(expense).items():
+                edges[pair] = edges.get(pair, 0) + amount
+    except Exception:
+        release_checkpoint_claim(claim)
+        raise
+    
+    if claimed_count == 0:
+        release_checkpoint_claim(claim)
+        return None, 0
+    
+    checkpoint = {
+        **claim,
+        'state': 'complete',
+        'covered_through': covered_through,
+        'balances': ledger.opening_balances(),
+        'total_amount': ledger.total_amount,
+        'expense_count': ledger.expense_count,
+        'payers': sorted(payers),
+        'debts': [
+            {'debtor': debtor, 'creditor': creditor, 'amount': amount}
+            for (debtor, creditor), amount in edges.items()
+        ]
+    }
+    mongo.db.checkpoints.replace_one({'_id': claim['_id']}, checkpoint)
+    invalidate_checkpoint_cache()
+    
+    # From here on reads ignore claimed expenses, so archiving can run (or be
+    # resumed by the next settle-up) without double counting
+    return checkpoint, archive_covered_expenses(checkpoint, batch_size)
+
+# Helper function to move the expenses a checkpoint claimed into expenses_archive
+def archive_covered_expenses(checkpoint, batch_size=1000):
+    archived = 0
+    while True:
+        batch = list(mongo.db.expenses.find({'checkpoint_id': checkpoint['_id']}).limit(batch_size))
+        if not batch:
+            return archived
         
-        for expense in expenses:
-            paid_by = expense['paid_by']
-            amount_paid = float(expense['amount'])
-            
-            # Initialize balance for payer
-            if paid_by not in balances:
-                balances[paid_by] = {'paid': 0, 'owes': 0, 'net': 0}
-            
-            balances[paid_by]['paid'] += amount_paid
-            
-            # Calculate individual amounts based on split type
-            individual_amounts = calculate_individual_amounts(expense)
+        # Upserts keep the copy idempotent if an earlier run was interrupted
+        mongo.db.expenses_archive.bulk_write([
+            ReplaceOne({'_id': expense['_id']}, expense, upsert=True)
+            for expense in batch
+        ], ordered=False)
+        archived += mongo.db.expenses.delete_many({'_id': {'$in': [expense['_id'] for expense in batch]}}).deleted_count
+
+# Helper function to get the ledger memoized per request, so routes (and batched
+# sub-requests) that need balances and settlements share one pass
+def get_ledger():
+    if 'ledger' not in g:
+        g.ledger = compute_ledger()
+    return g.ledger
+
+# Helper function to drop the memoized ledger after a write in this request
+def invalidate_ledger():
+    g.pop('ledger', None)
+
+# Helper function to calculate settlements with enhanced logic
+def calculate_settlements():
+    try:
+        return get_ledger().settlements()
+    except Exception as e:
+        logger.error("Error in calculate_settlements: %s", e)
+        if isinstance(e, pymongo.errors.ConnectionFailure):
+            raise
+        return []
+
+# Background settlements: /settlements answers from the last computed result
+# (stale-while-revalidate) while writes schedule a recompute on a background
+# thread. A write sets a deadline SETTLEMENTS_DEBOUNCE_MS out; later writes
+# join it without moving it, so a burst shares one recompute and a steady
+# stream of writes cannot postpone it indefinitely.
+SETTLEMENTS_BACKGROUND = os.getenv('SETTLEMENTS_BACKGROUND', 'false').lower() == 'true'
+SETTLEMENTS_DEBOUNCE_MS = float(os.getenv('SETTLEMENTS_DEBOUNCE_MS', 500))
+SETTLEMENTS_MAX_AGE_S = float(os.getenv('SETTLEMENTS_MAX_AGE_S', 30))
+
+class SettlementsPrecomputer:
+    def __init__(self, debounce_ms, max_age_s):
+        self.debounce = debounce_ms / 1000.0
+        self.max_age = max_age_s
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._compute_lock = threading.Lock()
+        self._thread = None
+        self._deadline = None
+        self.version = 0
+        self.result = None
+
+    def _ensure_started(self):
+        # Started lazily so the worker thread exists in each worker process
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='settlements', daemon=True)
+                    self._thread.start()
+
+    # Record a write; the first write since the last recompute sets the deadline
+    def mark_dirty(self):
+        self._ensure_started()
+        with self._lock:
+            self.version += 1
+            if self._deadline is None:
+                self._deadline = time.monotonic() + self.debounce
+                self._wake.notify()
+
+    # Ask the worker to recompute now, unless a recompute is already running
+    def schedule(self):
+        self._ensure_started()
+        if self._compute_lock.locked():
+            return
+        with self._lock:
+            self._deadline = time.monotonic()
+            self._wake.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while self._deadline is None:
+                    self._wake.wait()
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._wake.wait(remaining)
+                    continue
+                self._deadline = None
+            self._recompute()
+
+    def _recompute(self, if_missing=False):
+        # One recompute at a time: cold-start readers wait for the first
+        # result instead of each computing their own
+        with self._compute_lock:
+            if if_missing and self.result is not None:
+                return
+            with self._lock:
+                version = self.version
             
-            for person, amount_owed in individual_amounts.items():
-                if person not in balances:
-                    balances[person] = {'paid': 0, 'owes': 0, 'net': 0}
-                
-                balances[person]['owes'] += amount_owed
-        
-        # Calculate net balances
-        for person in balances:
-            balances[person]['net'] = balances[person]['paid'] - balances[person]['owes']
-            # Round to 2 decimal places
-            balances[person]['paid'] = round(balances[person]['paid'], 2)
-            balances[person]['owes'] = round(balances[person]['owes'], 2)
-            balances[person]['net'] = round(balances[person]['net'], 2)
-        
-        # Create settlement transactions
-        settlements = []
-        debtors = []  # People who owe money
-        creditors = []  # People who are owed money
-        
-        for person, balance in balances.items():
-            if balance['net'] < -0.01:  # Owes money (with small tolerance for floating point)
-                debtors.append({'person': person, 'amount': abs(balance['net'])})
-            elif balance['net'] > 0.01:  # Is owed money
-                creditors.append({'person': person, 'amount': balance['net']})
-        
-        # Create optimal settlements
-        for debtor in debtors:
-            remaining_debt = debtor['amount']
+            started = time.perf_counter()
+            try:
+                settlements = compute_ledger().settlements()
+            except Exception as e:
+                metrics.increment('settlements.recompute_errors')
+                logger.error("Error recomputing settlements: %s", e)
+                return
+            metrics.observe('settlements.recompute_ms', (time.perf_counter() - started) * 1000)
             
-            for creditor in creditors:
-                if remaining_debt <= 0.01:
+            with self._lock:
+                if self.result is None or version >= self.result['version']:
+                    self.result = {'settlements': settlements, 'version': version, 'computed_at': datetime.utcnow()}
+
+    # Latest result; computed inline only the first time
+    def get(self):
+        if self.result is None:
+            self._recompute(if_missing=True)
+        
+        with self._lock:
+            result = self.result
+            current_version = self.version
+        if result is None:
+            raise RuntimeError('Settlements are not available yet')
+        
+        age = (datetime.utcnow() - result['computed_at']).total_seconds()
+        if age > self.max_age:
+            # Writes made by other worker processes are picked up on expiry
+            self.schedule()
+        
+        return {
+            'settlements': result['settlements'],
+            'version': result['version'],
+            'computed_at': result['computed_at'],
+            'age_seconds': round(age, 3),
+            'stale': result['version'] < current_version or age > self.max_age
+        }
+
+settlements_precomputer = SettlementsPrecomputer(SETTLEMENTS_DEBOUNCE_MS, SETTLEMENTS_MAX_AGE_S) if SETTLEMENTS_BACKGROUND else None
+
+# Write coalescing: concurrent POST /expenses inserts that arrive within a short
+# window are flushed together with a single insert_many. IDs are assigned
+# client-side so every request still gets its own ID and its own error status.
+WRITE_COALESCING = os.getenv('WRITE_COALESCING', 'false').lower() == 'true'
+WRITE_COALESCING_MAX_BATCH = int(os.getenv('WRITE_COALESCING_MAX_BATCH', 50))
+WRITE_COALESCING_MAX_WAIT_MS = float(os.getenv('WRITE_COALESCING_MAX_WAIT_MS', 5))
+WRITE_COALESCING_TIMEOUT_S = float(os.getenv('WRITE_COALESCING_TIMEOUT_S', 10))
+
+class InsertCoalescer:
+    def __init__(self, max_batch, max_wait_ms):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily so the flusher thread exists in each worker process
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='insert-coalescer', daemon=True)
+                    self._thread.start()
+
+    # Queue a document for the next flush; the future resolves to its ID
+    def submit(self, document):
+        self._ensure_started()
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+        future = Future()
+        self._queue.put((document, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
                     break
-                
-                if creditor['amount'] <= 0.01:
-                    continue
-                
-                # Calculate settlement amount
-                settlement_amount = min(remaining_debt, creditor['amount'])
-                
-                settlements.append({
-                    'from': debtor['person'],
-                    'to': creditor['person'],
-                    'amount': round(settlement_amount, 2)
-                })
-                
-                remaining_debt -= settlement_amount
-                creditor['amount'] -= settlement_amount
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        documents = [document for document, _ in batch]
+        failed = {}
+        started = time.perf_counter()
+        try:
+            write_expenses().insert_many(documents, ordered=False)
+        except pymongo.errors.BulkWriteError as e:
+            # With ordered=False every document is attempted; only the listed indexes failed
+            for error in e.details.get('writeErrors', []):
+                failed[error['index']] = pymongo.errors.WriteError(error.get('errmsg'), error.get('code'), error)
+            if e.details.get('writeConcernErrors'):
+                metrics.increment('write_coalescing.write_concern_errors')
+        except Exception as e:
+            metrics.increment('write_coalescing.flush_errors')
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            metrics.observe('write_coalescing.batch_size', len(batch))
+            metrics.observe('write_coalescing.flush_latency_ms', (time.perf_counter() - started) * 1000)
         
-        return settlements
-    except Exception as e:
-        print(f"Error in calculate_settlements: {e}")
-        return []
+        for index, (document, future) in enumerate(batch):
+            if index in failed:
+                future.set_exception(failed[index])
+            else:
+                future.set_result(document['_id'])
 
-# Root endpoint - API welcome message
-@app.route('/', methods=['GET'])
-def welcome():
-    return jsonify({
-        'success': True,
-        'message': 'Welcome to Split App API',
-        'version': '1.0.0',
-        'api_endpoints': [
-            'GET /expenses - List all expenses',
-            'POST /expenses - Add new expense',
+insert_coalescer = InsertCoalescer(WRITE_COALESCING_MAX_BATCH, WRITE_COALESCING_MAX_WAIT_MS) if WRITE_COALESCING else None
+
+# Helper function to update derived data once a coalesced insert that outlived
+# its request commits (runs on the flusher thread)
+def apply_late_insert(expense, future):
+    if future.cancelled() or future.exception() is not None:
+        metrics.increment('write_coalescing.late_failures')
+        return
+    with app.app_context():
+        apply_expense_change(None, expense)
+    metrics.increment('write_coalescing.late_commits')
+
+# Admission control: expensive endpoints get a per-route concurrency limit and
+# a bounded wait queue. When the queue is full the request is shed with a fast
+# 503 and Retry-After, so cheap routes such as /health keep their workers.
+ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', 2))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 4))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', 2000))
+ADMISSION_RETRY_AFTER_S = int(os.getenv('ADMISSION_RETRY_AFTER_S', 1))
+
+class ConcurrencyLimiter:
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout_ms):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    return False
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                with self._lock:
+                    self.rejected += 1
+                return False
+        
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'rejected': self.rejected
+            }
+
+admission_limiters = {}
+
+# Decorator limiting how many requests run a route at once
+def limit_concurrency(name):
+    limiter = ConcurrencyLimiter(name, ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_MS)
+    admission_limiters[name] = limiter
+    
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            if not limiter.acquire():
+                metrics.increment(f'admission.{name}.rejected')
+                response = api_response({
+                    'success': False,
+                    'message': 'Server is busy, please retry shortly'
+                })
+                response.status_code = 503
+                response.headers['Retry-After'] = str(ADMISSION_RETRY_AFTER_S)
+                return response
+            
+            metrics.observe(f'admission.{name}.queue_wait_ms', (time.perf_counter() - started) * 1000)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                limiter.release()
+        return wrapper
+    return decorator
+
+# Round-trip budget: in development (or with DB_BUDGET_MODE set) a request that
+# makes more MongoDB round trips than DB_ROUND_TRIP_BUDGET is logged ('warn') or
+# turned into a 500 ('fail'), so N+1 query patterns show up during testing
+DB_ROUND_TRIP_BUDGET = int(os.getenv('DB_ROUND_TRIP_BUDGET', 25))
+DB_BUDGET_MODE = os.getenv('DB_BUDGET_MODE', 'warn' if os.getenv('FLASK_ENV') == 'development' else 'off')
+
+# Sub-requests run by POST /batch nest inside the outer request on the same
+# thread; their round trips count towards the outer request
+def in_sub_request():
+    return getattr(request_stats, 'depth', 0) > 1
+
+@app.before_request
+def start_round_trip_count():
+    if in_sub_request():
+        return
+    request_stats.active = True
+    request_stats.round_trips = 0
+
+@app.after_request
+def report_round_trips(response):
+    if in_sub_request() or not getattr(request_stats, 'active', False):
+        return response
+    
+    round_trips = request_stats.round_trips
+    request_stats.active = False
+    response.headers['X-DB-Round-Trips'] = str(round_trips)
+    endpoint = request.endpoint or 'unknown'
+    metrics.observe(f'db.round_trips.{endpoint}', round_trips)
+    
+    if DB_BUDGET_MODE == 'off':
+        return response
+    if os.getenv('FLASK_ENV') == 'development':
+        logger.info("MongoDB round trips", extra={'round_trips': round_trips})
+    # A batch gets the budget of each of its sub-requests
+    budget = DB_ROUND_TRIP_BUDGET * g.get('batch_size', 1)
+    if round_trips > budget:
+        metrics.increment(f'db.budget_exceeded.{endpoint}')
+        logger.warning("Round-trip budget exceeded", extra={'round_trips': round_trips, 'budget': budget})
+        if DB_BUDGET_MODE == 'fail':
+            failure = api_response({
+                'success': False,
+                'message': f'Round-trip budget exceeded: {round_trips} MongoDB round trips (budget {budget})'
+            })
+            failure.status_code = 500
+            failure.headers['X-DB-Round-Trips'] = str(round_trips)
+            return failure
+    return response
+
+@app.teardown_request
+def stop_round_trip_count(error=None):
+    if not in_sub_request():
+        request_stats.active = False
+
+# Background health probe: one thread pings MongoDB every HEALTH_PROBE_INTERVAL_S
+# and caches the result, so load balancer and orchestrator probes are answered
+# without a database round trip. The probe also feeds the circuit breaker,
+# which lets it close the breaker as soon as MongoDB is back.
+HEALTH_PROBE_INTERVAL_S = float(os.getenv('HEALTH_PROBE_INTERVAL_S', 5))
+
+class HealthProber:
+    def __init__(self, interval_s, window=60):
+        self.interval_s = interval_s
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.status = None
+
+    def ensure_running(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='health-prober', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.probe()
+            time.sleep(self.interval_s)
+
+    def probe(self):
+        started = time.perf_counter()
+        try:
+            mongo.db.command('ping')
+            latency_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._latencies.append(latency_ms)
+            db_breaker.record_success()
+            status = {'database': 'connected', 'latency_ms': round(latency_ms, 2), 'error': None}
+        except Exception as e:
+            status = {'database': 'disconnected', 'latency_ms': None, 'error': str(e)}
+        status['checked_at'] = datetime.utcnow()
+        metrics.increment(f"health.probe.{status['database']}")
+        self.status = status
+        return status
+
+    # Latest probe result; probes synchronously only before the first one has finished
+    def get(self):
+        status = self.status
+        if status is None:
+            status = self.probe()
+        with self._lock:
+            latencies = sorted(self._latencies)
+        age_s = (datetime.utcnow() - status['checked_at']).total_seconds()
+        return {
+            **status,
+            'checked_at': status['checked_at'].isoformat(),
+            'age_seconds': round(age_s, 1),
+            'fresh': age_s <= 3 * self.interval_s,
+            'latency': {
+                'samples': len(latencies),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'max_ms': round(latencies[-1], 2) if latencies else 0.0
+            }
+        }
+
+health_prober = HealthProber(HEALTH_PROBE_INTERVAL_S)
+
+@app.before_request
+def start_health_prober():
+    health_prober.ensure_running()
+
+# Degraded mode: the last successful response of each snapshot route is kept
+# in process and served, marked stale, while the circuit breaker is open
+SNAPSHOT_RECENT_EXPENSES = int(os.getenv('SNAPSHOT_RECENT_EXPENSES', 100))
+SNAPSHOT_ENDPOINTS = {'get_expenses', 'get_people', 'get_balances', 'get_settlements'}
+# Endpoints that never touch MongoDB keep working while the breaker is open
+# (a batch's sub-requests go through the breaker one by one)
+BREAKER_EXEMPT_ENDPOINTS = {
+    'welcome', 'health_check', 'liveness', 'readiness', 'get_metrics', 'get_slow_queries',
+    'balance_events', 'run_batch', 'static'
+}
+read_snapshots = {}
+
+# Helper function to keep a successful read response for degraded mode. With
+# documents=True, payload['data'] holds raw MongoDB documents that are run
+# through serialize_doc for each client on replay, so a snapshot taken for a
+# msgpack client still answers JSON clients with string IDs and ISO dates.
+def remember_snapshot(endpoint, payload, documents=False):
+    read_snapshots[endpoint] = {'payload': payload, 'documents': documents, 'stored_at': datetime.utcnow()}
+    return payload
+
+# Helper function to answer a request while MongoDB is unavailable
+def degraded_response():
+    retry_after = str(int(BREAKER_RESET_S))
+    snapshot = read_snapshots.get(request.endpoint)
+    # Only unfiltered GET /expenses is snapshotted
+    if request.method == 'GET' and snapshot is not None and not (request.endpoint == 'get_expenses' and request.args):
+        metrics.increment('breaker.stale_reads')
+        payload = snapshot['payload']
+        if snapshot['documents']:
+            payload = {**payload, 'data': [serialize_doc(dict(doc)) for doc in payload['data']]}
+        response = api_response({
+            **payload,
+            'stale': True,
+            'snapshot_at': snapshot['stored_at'].isoformat(),
+            'message': 'Database unavailable, serving last known data'
+        })
+    else:
+        metrics.increment('breaker.rejected')
+        response = api_response({
+            'success': False,
+            'message': 'Database temporarily unavailable, please retry shortly'
+        })
+        response.status_code = 503
+    response.headers['Retry-After'] = retry_after
+    return response
+
+@app.before_request
+def enforce_circuit_breaker():
+    if request.endpoint is None or request.endpoint in BREAKER_EXEMPT_ENDPOINTS:
+        return None
+    if not db_breaker.allow():
+        return degraded_response()
+    return None
+
+# Live balance events: GET /events is a server-sent events stream. Writes record
+# the people they affect in the request, and once the request finishes one event
+# with those people's new net balances goes to every subscriber. Each subscriber
+# has a small bounded queue; a subscriber that falls behind is told to resync
+# instead of growing its queue.
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', 5000))
+EVENTS_HEARTBEAT_S = float(os.getenv('EVENTS_HEARTBEAT_S', 15))
+
+class EventBroadcaster:
+    def __init__(self, queue_size, max_subscribers):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, event_type, data):
+        with self._lock:
+            self._sequence += 1
+            event = (self._sequence, event_type, data)
+            for subscriber in self._subscribers:
+                try:
+                    subscriber.put_nowait(event)
+                except queue.Full:
+                    # Drop the backlog; the client refetches /balances on resync
+                    self._drain(subscriber)
+                    subscriber.put_nowait((event[0], 'resync', {}))
+                    metrics.increment('events.resync')
+
+    @staticmethod
+    def _drain(subscriber):
+        try:
+            while True:
+                subscriber.get_nowait()
+        except queue.Empty:
+            pass
+
+    def stats(self):
+        return {
+            'subscribers': len(self._subscribers),
+            'max_subscribers': self.max_subscribers,
+            'published': self._sequence
+        }
+
+event_broadcaster = EventBroadcaster(EVENTS_QUEUE_SIZE, EVENTS_MAX_SUBSCRIBERS)
+
+# Helper function to collect the people whose balance an expense write changed
+def expense_people(expense):
+    if expense is None:
+        return set()
+    return {expense['paid_by'], *expense_split_amounts(expense)}
+
+# Helper function to record a write for the end-of-request balance event
+def note_balance_change(old_expense, new_expense, payers_changed=False):
+    if not event_broadcaster.has_subscribers():
+        return
+    changes = g.setdefault('balance_changes', {'expenses': [], 'people': set(), 'everyone': False})
+    expense = new_expense if new_expense is not None else old_expense
+    action = 'added' if old_expense is None else 'deleted' if new_expense is None else 'updated'
+    changes['expenses'].append({'id': str(expense['_id']), 'action': action})
+    changes['people'].update(expense_people(old_expense) | expense_people(new_expense))
+    # Re-divided equal splits change everyone's balance
+    changes['everyone'] = changes['everyone'] or payers_changed
+
+# Helper function to read net balances from the debt matrix: what others owe a
+# person minus what the person owes others. The matrix is updated on the write
+# path and read from the primary, so this reflects the request's own writes
+# without a ledger scan. people=None returns everyone in the matrix.
+def debt_matrix_nets(people=None):
+    query = {} if people is None else {'$or': [{'debtor': {'$in': list(people)}}, {'creditor': {'$in': list(people)}}]}
+    nets = {} if people is None else {person: 0 for person in people}
+    for doc in mongo.db.debts.find(query, {'_id': 0, 'debtor': 1, 'creditor': 1, 'amount': 1}):
+        nets[doc['creditor']] = nets.get(doc['creditor'], 0) + doc['amount']
+        nets[doc['debtor']] = nets.get(doc['debtor'], 0) - doc['amount']
+    return {person: round(net, 2) for person, net in nets.items() if people is None or person in people}
+
+@app.after_request
+def publish_balance_events(response):
+    # A batch publishes one event for all of its sub-requests
+    if in_sub_request():
+        return response
+    changes = g.pop('balance_changes', None)
+    if changes is None or response.status_code >= 400:
+        return response
+    try:
+        balances = debt_matrix_nets(None if changes['everyone'] else changes['people'])
+        for person in changes['people']:
+            balances.setdefault(person, 0)
+        event_broadcaster.publish('balances', {
+            'expenses': changes['expenses'],
+            'balances': dict(sorted(balances.items()))
+        })
+    except Exception as e:
+        logger.error("Error publishing balance event: %s", e)
+    return response
+
+# Helper function to format one server-sent event
+def format_sse(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+# Helper function to stream queued events to one subscriber, with heartbeats
+def stream_events(subscriber):
+    try:
+        yield f"retry: {int(EVENTS_HEARTBEAT_S * 1000)}\n\n"
+        while True:
+            try:
+                event_id, event_type, data = subscriber.get(timeout=EVENTS_HEARTBEAT_S)
+            except queue.Empty:
+                # Comment line: keeps proxies from closing the idle connection and
+                # surfaces disconnected clients on the next write
+                yield ": heartbeat\n\n"
+                continue
+            yield format_sse(event_id, event_type, data)
+    finally:
+        event_broadcaster.unsubscribe(subscriber)
+
+# Root endpoint - API welcome message
+@app.route('/', methods=['GET'])
+def welcome():
+    return api_response({
+        'success': True,
+        'message': 'Welcome to Split App API',
+        'version': '1.0.0',
+        'api_endpoints': [
+            'GET /expenses - List all expenses (filters: paid_by, participant, split_type, min_amount, max_amount, start_date, end_date, q)',
+            'POST /expenses - Add new expense',
             'PUT /expenses/:id - Update expense',
             'DELETE /expenses/:id - Delete expense',
+            'POST /expenses/batch-get - Fetch expenses by a list of IDs',
+            'POST /expenses/batch-update - Update many expenses in one request',
+            'POST /expenses/batch-delete - Delete many expenses in one request',
             'GET /settlements - Get settlement summary',
             'GET /balances - Show each person\'s balance',
+            'GET /balances/:person - One person\'s balance and statement (page, page_size)',
             'GET /people - List all people',
-            'GET /health - Health check',
+            'POST /settle-up - Checkpoint balances and archive settled expenses',
+            'GET /checkpoints - List settle-up checkpoints',
+            'GET /export/expenses.csv - Download expenses as CSV, one row per person-share',
+            'GET /export/balances.csv - Download balances as CSV',
+            'GET /debts/:from/:to - How much one person owes another',
+            'GET /debts/:person - One person\'s pairwise debts',
+            'POST /batch - Run several API requests in one round trip',
+            'GET /rollups/:person - One person\'s spend per day or month',
+            'GET /leaderboard - Top spenders for a day, month or all time',
+            'GET /events - Live balance updates (server-sent events)',
+            'GET /health - Health check (cached background probe)',
+            'GET /health/live - Liveness check',
+            'GET /health/ready - Readiness check with pool and latency stats',
+            'GET /metrics - In-process metrics',
+            'GET /admin/index-check - Verify expense filters use indexes',
+            'POST /admin/rebuild-debts - Rebuild the pairwise debt matrix',
+            'GET /admin/slow-queries - Recent slow MongoDB operations with sampled explain plans',
             'DELETE /clear-data - Clear all data (testing only)'
         ],
         'expense_split_types': {
@@ -341,40 +2226,78 @@ def welcome():
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
-    try:
-        # Test database connection
-        mongo.db.command('ping')
-        return jsonify({
-            'success': True,
-            'message': 'API is healthy',
-            'database': 'connected',
-            'timestamp': datetime.utcnow().isoformat()
-        }), 200
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'message': 'API health check failed',
-            'database': 'disconnected',
-            'error': str(e),
-            'timestamp': datetime.utcnow().isoformat()
-        }), 500
+    # Answered from the background probe; no database round trip
+    status = health_prober.get()
+    healthy = status['database'] == 'connected' and status['fresh']
+    body = {
+        'success': healthy,
+        'message': 'API is healthy' if healthy else 'API health check failed',
+        'database': status['database'] if status['fresh'] else 'unknown',
+        'checked_at': status['checked_at'],
+        'timestamp': datetime.utcnow().isoformat()
+    }
+    if status['error']:
+        body['error'] = status['error']
+    return api_response(body), 200 if healthy else 500
+
+# Liveness - the process is up and serving requests; never touches MongoDB
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    return api_response({
+        'success': True,
+        'status': 'alive',
+        'timestamp': datetime.utcnow().isoformat()
+    }), 200
+
+# Readiness - cached MongoDB status with pool and latency stats
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    status = health_prober.get()
+    breaker = db_breaker.stats()
+    ready = status['database'] == 'connected' and status['fresh'] and breaker['state'] == 'closed'
+    return api_response({
+        'success': ready,
+        'status': 'ready' if ready else 'not_ready',
+        'database': status,
+        'circuit_breaker': breaker,
+        'mongo_pool': pool_monitor.stats(),
+        'timestamp': datetime.utcnow().isoformat()
+    }), 200 if ready else 503
 
 # API Routes
 @app.route('/expenses', methods=['GET'])
 def get_expenses():
     try:
-        expenses = list(mongo.db.expenses.find().sort('created_at', -1))
+        query, errors = build_expense_filter(request.args)
+        if errors:
+            return api_response({
+                'success': False,
+                'message': 'Invalid filters',
+                'errors': errors
+            }), 400
+        
+        expenses = list(read_expenses().find(query).sort('created_at', -1))
+        if not query:
+            # Copied before serialize_doc rewrites the documents for this client
+            recent = [dict(expense) for expense in expenses[:SNAPSHOT_RECENT_EXPENSES]]
+            remember_snapshot('get_expenses', {
+                'success': True,
+                'data': recent,
+                'count': len(recent),
+                'message': f'Retrieved {len(expenses)} expenses successfully'
+            }, documents=True)
         serialized_expenses = [serialize_doc(expense) for expense in expenses]
         
-        return jsonify({
+        payload = {
             'success': True,
             'data': serialized_expenses,
             'count': len(serialized_expenses),
             'message': f'Retrieved {len(serialized_expenses)} expenses successfully'
-        }), 200
+        }
+        return api_response(payload), 200
     except Exception as e:
-        print(f"Error in get_expenses: {e}")
-        return jsonify({
+        logger.error("Error in get_expenses: %s", e)
+        return api_response({
             'success': False,
             'message': f'Error retrieving expenses: {str(e)}'
         }), 500
@@ -382,10 +2305,10 @@ def get_expenses():
 @app.route('/expenses', methods=['POST'])
 def add_expense():
     try:
-        data = request.get_json()
+        data = request_body()
         
         if not data:
-            return jsonify({
+            return api_response({
                 'success': False,
                 'message': 'No data provided'
             }), 400
@@ -397,7 +2320,7 @@ def add_expense():
         # Validate data
         errors = validate_expense_data(data)
         if errors:
-            return jsonify({
+            return api_response({
                 'success': False,
                 'message': 'Validation failed',
                 'errors': errors
@@ -410,43 +2333,85 @@ def add_expense():
             'paid_by': data['paid_by'].strip(),
             'split_type': data.get('split_type', 'equal'),
             'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow()
+            'updated_at': datetime.utcnow(),
+            'version': 1
         }
         
         # Add participants if provided
         if 'participants' in data:
             expense['participants'] = data['participants']
         
-        # Insert into database
-        result = mongo.db.expenses.insert_one(expense)
-        expense['_id'] = str(result.inserted_id)
+        expense['split_amounts'] = materialize_split_amounts(expense)
         
-        return jsonify({
+        # Insert into database (coalesced with concurrent inserts when enabled)
+        if insert_coalescer is not None:
+            future = insert_coalescer.submit(expense)
+            try:
+                inserted_id = future.result(timeout=WRITE_COALESCING_TIMEOUT_S)
+            except FutureTimeoutError:
+                # The insert is still queued and may yet commit, so a 500 would
+                # invite a duplicate retry. Hand back its client-assigned ID instead.
+                future.add_done_callback(functools.partial(apply_late_insert, expense))
+                # serialize_doc rewrites in place; the queued document must keep its types
+                return api_response({
+                    'success': True,
+                    'pending': True,
+                    'data': serialize_doc(dict(expense)),
+                    'message': 'Expense accepted; the insert is still pending'
+                }), 202
+        else:
+            inserted_id = write_expenses().insert_one(expense).inserted_id
+        apply_expense_change(None, expense)
+        expense['_id'] = inserted_id
+        
+        return with_etag(api_response({
             'success': True,
             'data': serialize_doc(expense),
             'message': 'Expense added successfully'
-        }), 201
+        }), expense), 201
         
     except Exception as e:
-        print(f"Error in add_expense: {e}")
-        return jsonify({
+        logger.error("Error in add_expense: %s", e)
+        return api_response({
             'success': False,
             'message': f'Error adding expense: {str(e)}'
         }), 500
 
+# Helper function to explain why a conditional expense update or delete matched
+# nothing. Settled expenses get 409 whether or not they have been archived yet.
+def update_conflict_response(expense_id):
+    current = mongo.db.expenses.find_one({'_id': ObjectId(expense_id)}, {'checkpoint_id': 1, 'version': 1})
+    if current is None and mongo.db.expenses_archive.find_one({'_id': ObjectId(expense_id)}, {'_id': 1}) is None:
+        return api_response({
+            'success': False,
+            'message': 'Expense not found'
+        }), 404
+    
+    if current is None or not is_unsettled(current):
+        return api_response({
+            'success': False,
+            'message': 'Expense is covered by a settle-up checkpoint and can no longer be changed'
+        }), 409
+    
+    return with_etag(api_response({
+        'success': False,
+        'message': 'Expense was modified by another request',
+        'current_version': expense_version(current)
+    }), current), 409
+
 @app.route('/expenses/<expense_id>', methods=['PUT'])
 def update_expense(expense_id):
     try:
         # Validate ObjectId
         if not ObjectId.is_valid(expense_id):
-            return jsonify({
+            return api_response({
                 'success': False,
                 'message': 'Invalid expense ID'
             }), 400
         
-        data = request.get_json()
+        data = request_body()
         if not data:
-            return jsonify({
+            return api_response({
                 'success': False,
                 'message': 'No data provided'
             }), 400
@@ -454,50 +2419,58 @@ def update_expense(expense_id):
         # Validate data
         errors = validate_expense_data(data, is_update=True)
         if errors:
-            return jsonify({
+            return api_response({
                 'success': False,
                 'message': 'Validation failed',
                 'errors': errors
             }), 400
         
+        try:
+            expected_version = parse_if_match()
+        except BadRequest as e:
+            return api_response({
+                'success': False,
+                'message': e.description
+            }), 400
+        
         # Prepare update data
-        update_data = {'updated_at': datetime.utcnow()}
-        
-        if 'amount' in data:
-            update_data['amount'] = float(data['amount'])
-        if 'description' in data:
-            update_data['description'] = data['description'].strip()
-        if 'paid_by' in data:
-            update_data['paid_by'] = data['paid_by'].strip()
-        if 'split_type' in data:
-            update_data['split_type'] = data['split_type']
-        if 'participants' in data:
-            update_data['participants'] = data['participants']
+        update_data = build_update_data(data)
+        
+        # Only unsettled expenses can change, and only from the version the client last saw
+        query = {'_id': ObjectId(expense_id), **UNCLAIMED_FILTER}
+        if expected_version is not None:
+            query.update(version_filter(expected_version))
         
-        # Update expense
-        result = mongo.db.expenses.update_one(
-            {'_id': ObjectId(expense_id)},
-            {'$set': update_data}
+        # The stored split depends on fields that may not be in the update, so read
+        # them first and make the write conditional on the version that was read
+        if SPLIT_FIELDS.intersection(update_data):
+            current = mongo.db.expenses.find_one({'_id': ObjectId(expense_id)})
+            if current is not None and (expected_version is None or expense_version(current) == expected_version):
+                update_data['split_amounts'] = materialize_split_amounts({**current, **update_data})
+                query.update(version_filter(expense_version(current)))
+        
+        # One atomic find-and-modify; the previous document is kept to update derived data
+        old_expense = mongo.db.expenses.find_one_and_update(
+            query,
+            {'$set': update_data, '$inc': {'version': 1}},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
-            return jsonify({
-                'success': False,
-                'message': 'Expense not found'
-            }), 404
+        if old_expense is None:
+            return update_conflict_response(expense_id)
         
-        # Return updated expense
-        updated_expense = mongo.db.expenses.find_one({'_id': ObjectId(expense_id)})
+        updated_expense = {**old_expense, **update_data, 'version': expense_version(old_expense) + 1}
+        apply_expense_change(old_expense, updated_expense)
         
-        return jsonify({
+        return with_etag(api_response({
             'success': True,
-            'data': serialize_doc(updated_expense),
+            'data': serialize_doc(dict(updated_expense)),
             'message': 'Expense updated successfully'
-        }), 200
+        }), updated_expense), 200
         
     except Exception as e:
-        print(f"Error in update_expense: {e}")
-        return jsonify({
+        logger.error("Error in update_expense: %s", e)
+        return api_response({
             'success': False,
             'message': f'Error updating expense: {str(e)}'
         }), 500
@@ -507,59 +2480,439 @@ def delete_expense(expense_id):
     try:
         # Validate ObjectId
         if not ObjectId.is_valid(expense_id):
-            return jsonify({
+            return api_response({
                 'success': False,
                 'message': 'Invalid expense ID'
             }), 400
         
-        # Delete expense
-        result = mongo.db.expenses.delete_one({'_id': ObjectId(expense_id)})
+        # Delete expense, returning it to update derived data
+        deleted_expense = mongo.db.expenses.find_one_and_delete({'_id': ObjectId(expense_id), **UNCLAIMED_FILTER})
         
-        if result.deleted_count == 0:
-            return jsonify({
-                'success': False,
-                'message': 'Expense not found'
-            }), 404
+        if deleted_expense is None:
+            return update_conflict_response(expense_id)
         
-        return jsonify({
+        apply_expense_change(deleted_expense, None)
+        
+        return api_response({
             'success': True,
             'message': 'Expense deleted successfully'
         }), 200
         
     except Exception as e:
-        print(f"Error in delete_expense: {e}")
-        return jsonify({
+        logger.error("Error in delete_expense: %s", e)
+        return api_response({
             'success': False,
             'message': f'Error deleting expense: {str(e)}'
         }), 500
 
+# Batch endpoints: one $in read and one bulk_write per request, with the same
+# per-item validation as the single-item routes and a result for every item
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+
+# Helper function to validate a batch request's list of items
+def validate_batch_items(data, field):
+    if not data or not isinstance(data.get(field), list) or not data[field]:
+        return f"'{field}' must be a non-empty list"
+    if len(data[field]) > BATCH_MAX_ITEMS:
+        return f"A batch can contain at most {BATCH_MAX_ITEMS} items"
+    return None
+
+# Helper function to check a batch item ID (a string, or a native ObjectId from msgpack clients)
+def is_expense_id(value):
+    return isinstance(value, (str, ObjectId)) and ObjectId.is_valid(value)
+
+# Helper function to fetch expenses for a batch with a single $in query
+def find_expenses_by_ids(object_ids):
+    return {expense['_id']: expense for expense in mongo.db.expenses.find({'_id': {'$in': object_ids}})}
+
+# Helper function to find which of a batch's missing IDs were settled and archived
+def find_archived_ids(object_ids):
+    if not object_ids:
+        return set()
+    return {expense['_id'] for expense in mongo.db.expenses_archive.find({'_id': {'$in': object_ids}}, {'_id': 1})}
+
+SETTLED_MESSAGE = 'Expense is covered by a settle-up checkpoint and can no longer be changed'
+
+# Helper function to run a batch's bulk_write, returning the server's counts
+# (nMatched, nRemoved, ...) and its errors mapped back to operation indexes
+def run_bulk_write(operations):
+    if not operations:
+        return {}, {}
+    try:
+        return mongo.db.expenses.bulk_write(operations, ordered=False).bulk_api_result, {}
+    except pymongo.errors.BulkWriteError as e:
+        return e.details, {error['index']: error.get('errmsg', 'Write failed') for error in e.details.get('writeErrors', [])}
+
+# Helper function to explain a batch item whose conditional write matched nothing,
+# answered like update_conflict_response: 409 with the current version and ETag
+def batch_conflict(result, current):
+    if current is None:
+        result.update({'status': 404, 'message': 'Expense not found'})
+    elif not is_unsettled(current):
+        result.update({'status': 409, 'message': SETTLED_MESSAGE})
+    else:
+        result.update({
+            'status': 409,
+            'message': 'Expense was modified by another request',
+            'current_version': expense_version(current),
+            'etag': quote_etag(str(expense_version(current)))
+        })
+
+@app.route('/expenses/batch-get', methods=['POST'])
+def batch_get_expenses():
+    try:
+        data = request_body(silent=True)
+        error = validate_batch_items(data, 'ids')
+        if error:
+            return api_response({
+                'success': False,
+                'message': error
+            }), 400
+        
+        invalid = [expense_id for expense_id in data['ids'] if not is_expense_id(expense_id)]
+        if invalid:
+            return api_response({
+                'success': False,
+                'message': 'Invalid expense IDs',
+                'errors': [f"Invalid expense ID: {expense_id}" for expense_id in invalid]
+            }), 400
+        
+        found = find_expenses_by_ids([ObjectId(expense_id) for expense_id in data['ids']])
+        expenses = [serialize_doc(found[ObjectId(expense_id)]) for expense_id in data['ids'] if ObjectId(expense_id) in found]
+        missing = [expense_id for expense_id in data['ids'] if ObjectId(expense_id) not in found]
+        
+        return api_response({
+            'success': True,
+            'data': expenses,
+            'count': len(expenses),
+            'missing': missing,
+            'message': f'Retrieved {len(expenses)} expenses successfully'
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error in batch_get_expenses: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error retrieving expenses: {str(e)}'
+        }), 500
+
+@app.route('/expenses/batch-update', methods=['POST'])
+def batch_update_expenses():
+    try:
+        data = request_body(silent=True)
+        error = validate_batch_items(data, 'updates')
+        if error:
+            return api_response({
+                'success': False,
+                'message': error
+            }), 400
+        
+        results = []
+        pending = []
+        seen = set()
+        for item in data['updates']:
+            expense_id = item.get('_id') if isinstance(item, dict) else None
+            if not is_expense_id(expense_id):
+                results.append({'_id': expense_id, 'status': 400, 'message': 'Invalid expense ID'})
+                continue
+            if ObjectId(expense_id) in seen:
+                results.append({'_id': expense_id, 'status': 400, 'message': 'Duplicate expense ID in batch'})
+                continue
+            seen.add(ObjectId(expense_id))
+            expected_version = item.get('version')
+            if expected_version is not None and (isinstance(expected_version, bool) or not isinstance(expected_version, int) or expected_version < 0):
+                results.append({'_id': expense_id, 'status': 400, 'message': 'version must be a non-negative integer'})
+                continue
+            fields = {key: value for key, value in item.items() if key not in ('_id', 'version')}
+            if not fields:
+                results.append({'_id': expense_id, 'status': 400, 'message': 'No data provided'})
+                continue
+            errors = validate_expense_data(fields, is_update=True)
+            if errors:
+                results.append({'_id': expense_id, 'status': 400, 'message': 'Validation failed', 'errors': errors})
+                continue
+            result = {'_id': expense_id}
+            results.append(result)
+            pending.append((result, ObjectId(expense_id), expected_version, build_update_data(fields)))
+        
+        old_expenses = find_expenses_by_ids([object_id for _, object_id, _, _ in pending])
+        archived = find_archived_ids([object_id for _, object_id, _, _ in pending if object_id not in old_expenses])
+        checkpoint = get_latest_checkpoint(cached=True)
+        payers = set(get_payers(checkpoint=checkpoint))
+        # updated_at, cut to MongoDB's millisecond precision, marks this batch's writes
+        written_at = datetime.utcnow()
+        written_at = written_at.replace(microsecond=written_at.microsecond // 1000 * 1000)
+        operations = []
+        applied = []
+        for result, object_id, expected_version, update_data in pending:
+            old_expense = old_expenses.get(object_id)
+            if old_expense is None and object_id not in archived:
+                result.update({'status': 404, 'message': 'Expense not found'})
+                continue
+            if old_expense is None or not is_unsettled(old_expense):
+                result.update({'status': 409, 'message': SETTLED_MESSAGE})
+                continue
+            if expected_version is not None and expected_version != expense_version(old_expense):
+                batch_conflict(result, old_expense)
+                continue
+            
+            update_data['updated_at'] = written_at
+            new_expense = {**old_expense, **update_data, 'version': expense_version(old_expense) + 1}
+            if SPLIT_FIELDS.intersection(update_data):
+                update_data['split_amounts'] = materialize_split_amounts(new_expense, payers | {new_expense['paid_by']})
+                new_expense['split_amounts'] = update_data['split_amounts']
+            
+            # Conditional on the version read above, so derived data is diffed
+            # against the document the write actually replaced
+            operations.append(UpdateOne(
+                {'_id': object_id, **version_filter(expense_version(old_expense)), **UNCLAIMED_FILTER},
+                {'$set': update_data, '$inc': {'version': 1}}
+            ))
+            applied.append((result, old_expense, new_expense))
+        
+        counts, failed = run_bulk_write(operations)
+        written = [(index, item) for index, item in enumerate(applied) if index not in failed]
+        current = None
+        if counts.get('nMatched', 0) < len(written):
+            # Some writes matched nothing: re-read to find the ones that landed
+            current = find_expenses_by_ids([new_expense['_id'] for _, (_, _, new_expense) in written])
+        
+        changes = []
+        for index, (result, old_expense, new_expense) in enumerate(applied):
+            if index in failed:
+                result.update({'status': 500, 'message': failed[index]})
+                continue
+            if current is not None and current.get(new_expense['_id'], {}).get('updated_at') != written_at:
+                batch_conflict(result, current.get(new_expense['_id']))
+                continue
+            changes.append((old_expense, new_expense))
+            result.update({'status': 200, 'data': serialize_doc(dict(new_expense))})
+        
+        if changes:
+            payers_changed = any(old['paid_by'] != new['paid_by'] for old, new in changes) \
+                and set(get_payers(checkpoint=checkpoint)) != payers
+            apply_expense_changes(changes, payers_changed)
+        
+        updated = sum(1 for result in results if result['status'] == 200)
+        return api_response({
+            'success': updated == len(results),
+            'data': results,
+            'updated_count': updated,
+            'message': f'Updated {updated} of {len(results)} expenses'
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error in batch_update_expenses: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error updating expenses: {str(e)}'
+        }), 500
+
+@app.route('/expenses/batch-delete', methods=['POST'])
+def batch_delete_expenses():
+    try:
+        data = request_body(silent=True)
+        error = validate_batch_items(data, 'ids')
+        if error:
+            return api_response({
+                'success': False,
+                'message': error
+            }), 400
+        
+        results = []
+        object_ids = []
+        seen = set()
+        for expense_id in data['ids']:
+            if not is_expense_id(expense_id):
+                results.append({'_id': expense_id, 'status': 400, 'message': 'Invalid expense ID'})
+            elif ObjectId(expense_id) in seen:
+                results.append({'_id': expense_id, 'status': 400, 'message': 'Duplicate expense ID in batch'})
+            else:
+                seen.add(ObjectId(expense_id))
+                result = {'_id': expense_id}
+                results.append(result)
+                object_ids.append((result, ObjectId(expense_id)))
+        
+        # Deleted documents are needed to update derived data
+        old_expenses = find_expenses_by_ids([object_id for _, object_id in object_ids])
+        archived = find_archived_ids([object_id for _, object_id in object_ids if object_id not in old_expenses])
+        operations = []
+        applied = []
+        for result, object_id in object_ids:
+            old_expense = old_expenses.get(object_id)
+            if old_expense is None and object_id not in archived:
+                result.update({'status': 404, 'message': 'Expense not found'})
+            elif old_expense is None or not is_unsettled(old_expense):
+                result.update({'status': 409, 'message': SETTLED_MESSAGE})
+            else:
+                operations.append(DeleteOne({'_id': object_id, **version_filter(expense_version(old_expense)), **UNCLAIMED_FILTER}))
+                applied.append((result, old_expense))
+        
+        checkpoint = get_latest_checkpoint(cached=True)
+        payers = set(get_payers(checkpoint=checkpoint)) if applied else set()
+        counts, failed = run_bulk_write(operations)
+        written = [(index, item) for index, item in enumerate(applied) if index not in failed]
+        remaining = None
+        if counts.get('nRemoved', 0) < len(written):
+            # Some deletes matched nothing: the expenses still present were
+            # changed or settled in the meantime. Expenses another request
+            # deleted concurrently cannot be told apart from ours, so only as
+            # many absent ones as were removed are counted as deleted here.
+            remaining = find_expenses_by_ids([old_expense['_id'] for _, (_, old_expense) in written])
+            unattributed = len(written) - len(remaining) - counts.get('nRemoved', 0)
+        
+        changes = []
+        for index, (result, old_expense) in enumerate(applied):
+            if index in failed:
+                result.update({'status': 500, 'message': failed[index]})
+                continue
+            if remaining is not None:
+                if old_expense['_id'] in remaining:
+                    batch_conflict(result, remaining[old_expense['_id']])
+                    continue
+                if unattributed > 0:
+                    unattributed -= 1
+                    batch_conflict(result, None)
+                    continue
+            changes.append((old_expense, None))
+            result.update({'status': 200, 'message': 'Expense deleted successfully'})
+        
+        if changes:
+            apply_expense_changes(changes, set(get_payers(checkpoint=checkpoint)) != payers)
+        
+        deleted = sum(1 for result in results if result['status'] == 200)
+        return api_response({
+            'success': deleted == len(results),
+            'data': results,
+            'deleted_count': deleted,
+            'message': f'Deleted {deleted} of {len(results)} expenses'
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error in batch_delete_expenses: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error deleting expenses: {str(e)}'
+        }), 500
+
+# Request batching: POST /batch runs several sub-requests against the existing
+# routes in one HTTP round trip. Sub-requests run in order inside the batch's
+# application context, so they share flask.g and with it the memoized ledger.
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 20))
+BATCH_SUBREQUEST_METHODS = {'GET', 'POST', 'PUT', 'DELETE'}
+# Nested batches and endless streams cannot run as sub-requests
+BATCH_EXCLUDED_PATHS = ('/batch', '/events')
+
+# Helper function to validate one sub-request, returning an error message or None
+def validate_subrequest(item):
+    if not isinstance(item, dict):
+        return 'Each request must be an object'
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if method not in BATCH_SUBREQUEST_METHODS:
+        return f"method must be one of: {', '.join(sorted(BATCH_SUBREQUEST_METHODS))}"
+    if not isinstance(path, str) or not path.startswith('/'):
+        return 'path must be a string starting with /'
+    if path.split('?', 1)[0].rstrip('/') in BATCH_EXCLUDED_PATHS:
+        return f'{path} cannot be called from a batch'
+    if 'headers' in item and not isinstance(item['headers'], dict):
+        return 'headers must be an object'
+    return None
+
+# Helper function to run one sub-request through the normal dispatch (hooks, routing, error handlers)
+def run_subrequest(item):
+    # Sub-responses are embedded in the batch's own body, so they are always
+    # rendered as JSON; the batch response itself still honours msgpack
+    headers = {str(key): str(value) for key, value in item.get('headers', {}).items() if str(key).lower() != 'accept'}
+    headers['Accept'] = 'application/json'
+    with app.test_request_context(
+        item['path'],
+        method=str(item.get('method', 'GET')).upper(),
+        json=item.get('body'),
+        headers=headers
+    ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            logger.exception("Error in batch sub-request", extra={'path': item['path']})
+            return {'status': 500, 'body': {'success': False, 'message': f'Error running request: {str(e)}'}}
+        
+        result = {'status': response.status_code}
+        if response.headers.get('ETag'):
+            result['etag'] = response.headers['ETag']
+        result['body'] = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+        return result
+
+@app.route('/batch', methods=['POST'])
+def run_batch():
+    try:
+        data = request_body(silent=True)
+        requests_list = data.get('requests') if isinstance(data, dict) else None
+        if not isinstance(requests_list, list) or not requests_list:
+            return api_response({
+                'success': False,
+                'message': 'requests must be a non-empty list'
+            }), 400
+        
+        if len(requests_list) > BATCH_MAX_REQUESTS:
+            return api_response({
+                'success': False,
+                'message': f'At most {BATCH_MAX_REQUESTS} requests per batch'
+            }), 400
+        
+        errors = [f"Request {index}: {error}" for index, error in
+                  ((index, validate_subrequest(item)) for index, item in enumerate(requests_list)) if error]
+        if errors:
+            return api_response({
+                'success': False,
+                'message': 'Invalid batch',
+                'errors': errors
+            }), 400
+        
+        g.batch_size = len(requests_list)
+        responses = [run_subrequest(item) for item in requests_list]
+        succeeded = sum(1 for response in responses if response['status'] < 400)
+        return api_response({
+            'success': succeeded == len(responses),
+            'data': responses,
+            'message': f'{succeeded} of {len(responses)} requests succeeded'
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error in run_batch: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error running batch: {str(e)}'
+        }), 500
+
 @app.route('/people', methods=['GET'])
 def get_people():
     try:
-        # Get unique people from expenses
-        people = mongo.db.expenses.distinct('paid_by')
+        # Get unique people from expenses (including settled ones)
+        people = get_payers()
         
-        return jsonify({
+        return api_response(remember_snapshot('get_people', {
             'success': True,
             'data': sorted(people),
             'count': len(people),
             'message': f'Retrieved {len(people)} people successfully'
-        }), 200
+        })), 200
         
     except Exception as e:
-        print(f"Error in get_people: {e}")
-        return jsonify({
+        logger.error("Error in get_people: %s", e)
+        return api_response({
             'success': False,
             'message': f'Error retrieving people: {str(e)}'
         }), 500
 
 @app.route('/balances', methods=['GET'])
+@limit_concurrency('balances')
 def get_balances():
     try:
-        expenses = list(mongo.db.expenses.find())
+        ledger = get_ledger()
         
-        if not expenses:
-            return jsonify({
+        if ledger.expense_count == 0:
+            return api_response(remember_snapshot('get_balances', {
                 'success': True,
                 'data': {
                     'balances': {},
@@ -567,93 +2920,672 @@ def get_balances():
                     'summary': 'No expenses found'
                 },
                 'message': 'No expenses found'
-            }), 200
+            })), 200
         
-        # Calculate balances
-        balances = {}
-        total_amount = 0
+        summary = ledger.summary()
+        return api_response(remember_snapshot('get_balances', {
+            'success': True,
+            'data': {
+                'balances': summary['balances'],
+                'total_amount': summary['total_amount'],
+                'num_people': summary['num_people']
+            },
+            'message': 'Balances calculated successfully'
+        })), 200
         
-        for expense in expenses:
-            paid_by = expense['paid_by']
-            amount_paid = float(expense['amount'])
-            total_amount += amount_paid
-            
-            # Initialize balance for payer
-            if paid_by not in balances:
-                balances[paid_by] = {'paid': 0, 'owes': 0, 'net': 0}
-            
-            balances[paid_by]['paid'] += amount_paid
-            
-            # Calculate individual amounts based on split type
-            individual_amounts = calculate_individual_amounts(expense)
-            
-            for person, amount_owed in individual_amounts.items():
-                if person not in balances:
-                    balances[person] = {'paid': 0, 'owes': 0, 'net': 0}
-                
-                balances[person]['owes'] += amount_owed
+    except Exception as e:
+        logger.error("Error in get_balances: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error calculating balances: {str(e)}'
+        }), 500
+
+@app.route('/balances/<person>', methods=['GET'])
+@limit_concurrency('person_balance')
+def get_person_balance(person):
+    try:
+        page, page_size, errors = parse_pagination(request.args)
+        if errors:
+            return api_response({
+                'success': False,
+                'message': 'Invalid pagination',
+                'errors': errors
+            }), 400
+        
+        # Equal splits are divided among all payers (uses the paid_by index)
+        checkpoint = get_latest_checkpoint()
+        payers = get_payers(read_expenses(), checkpoint)
+        is_payer = person in payers
+        
+        # Balance carried over from the latest settle-up checkpoint
+        opening = None
+        if checkpoint is not None:
+            opening = next((entry for entry in checkpoint['balances'] if entry['person'] == person), None)
+        has_opening = opening is not None
+        opening = opening or {'paid': 0, 'owes': 0}
+        opening_net = opening['paid'] - opening['owes']
+        
+        # Per-expense contribution and running balance are computed server-side
+        pipeline = [
+            {'$match': {**hot_expense_filter(checkpoint), **person_expense_match(person, is_payer)}},
+            {'$project': {
+                'description': 1,
+                'amount': 1,
+                'paid_by': 1,
+                'split_type': 1,
+                'created_at': 1,
+                'paid': {'$cond': [{'$eq': ['$paid_by', person]}, '$amount', 0]},
+                'owes': person_owed_expression(person, len(payers), is_payer)
+            }},
+            {'$addFields': {'net': {'$subtract': ['$paid', '$owes']}}},
+            {'$facet': {
+                'summary': [
+                    {'$group': {
+                        '_id': None,
+                        'paid': {'$sum': '$paid'},
+                        'owes': {'$sum': '$owes'},
+                        'count': {'$sum': 1}
+                    }}
+                ],
+                'statement': [
+                    {'$setWindowFields': {
+                        'sortBy': {'created_at': 1, '_id': 1},
+                        'output': {
+                            'running_balance': {
+                                '$sum': '$net',
+                                'window': {'documents': ['unbounded', 'current']}
+                            }
+                        }
+                    }},
+                    {'$skip': (page - 1) * page_size},
+                    {'$limit': page_size}
+                ]
+            }}
+        ]
+        
+        result = next(read_expenses().aggregate(pipeline), {'summary': [], 'statement': []})
+        
+        if not result['summary'] and not has_opening:
+            return api_response({
+                'success': False,
+                'message': f'No expenses found for {person}'
+            }), 404
         
-        # Calculate net balances
-        for person in balances:
-            balances[person]['net'] = balances[person]['paid'] - balances[person]['owes']
-            # Round to 2 decimal places
-            balances[person]['paid'] = round(balances[person]['paid'], 2)
-            balances[person]['owes'] = round(balances[person]['owes'], 2)
-            balances[person]['net'] = round(balances[person]['net'], 2)
+        summary = result['summary'][0] if result['summary'] else {'paid': 0, 'owes': 0, 'count': 0}
+        paid = opening['paid'] + summary['paid']
+        owes = opening['owes'] + summary['owes']
+        statement = []
+        for row in result['statement']:
+            row['running_balance'] += opening_net
+            for field in ['paid', 'owes', 'net', 'running_balance']:
+                row[field] = round(row[field], 2)
+            statement.append(serialize_doc(row))
         
-        return jsonify({
+        return api_response({
             'success': True,
             'data': {
-                'balances': balances,
-                'total_amount': round(total_amount, 2),
-                'num_people': len(balances)
+                'person': person,
+                'balance': {
+                    'paid': round(paid, 2),
+                    'owes': round(owes, 2),
+                    'net': round(paid - owes, 2)
+                },
+                'opening_balance': round(opening_net, 2),
+                'statement': statement,
+                'pagination': {
+                    'page': page,
+                    'page_size': page_size,
+                    'total_items': summary['count'],
+                    'has_more': page * page_size < summary['count']
+                }
             },
-            'message': 'Balances calculated successfully'
+            'message': f'Balance calculated successfully for {person}'
         }), 200
         
     except Exception as e:
-        print(f"Error in get_balances: {e}")
-        return jsonify({
+        logger.error("Error in get_person_balance: %s", e)
+        return api_response({
             'success': False,
-            'message': f'Error calculating balances: {str(e)}'
+            'message': f'Error calculating balance: {str(e)}'
         }), 500
 
 @app.route('/settlements', methods=['GET'])
+@limit_concurrency('settlements')
 def get_settlements():
     try:
+        if settlements_precomputer is not None:
+            # Serve the last computed result; a recompute runs in the background
+            snapshot = settlements_precomputer.get()
+            settlements = snapshot['settlements']
+            total_settlement = sum(settlement['amount'] for settlement in settlements)
+            
+            return api_response(remember_snapshot('get_settlements', {
+                'success': True,
+                'data': settlements,
+                'count': len(settlements),
+                'total_settlement_amount': round(total_settlement, 2),
+                'version': snapshot['version'],
+                'computed_at': snapshot['computed_at'].isoformat(),
+                'age_seconds': snapshot['age_seconds'],
+                'stale': snapshot['stale'],
+                'message': f'Calculated {len(settlements)} settlements successfully'
+            })), 200
+        
         settlements = calculate_settlements()
         
         # Calculate total settlement amount
         total_settlement = sum(settlement['amount'] for settlement in settlements)
         
-        return jsonify({
+        return api_response(remember_snapshot('get_settlements', {
             'success': True,
             'data': settlements,
             'count': len(settlements),
             'total_settlement_amount': round(total_settlement, 2),
             'message': f'Calculated {len(settlements)} settlements successfully'
-        }), 200
+        })), 200
         
     except Exception as e:
-        print(f"Error in get_settlements: {e}")
-        return jsonify({
+        logger.error("Error in get_settlements: %s", e)
+        return api_response({
             'success': False,
             'message': f'Error calculating settlements: {str(e)}'
         }), 500
 
+# Helper function to summarize a checkpoint for API responses
+def serialize_checkpoint(checkpoint):
+    balances = {
+        entry['person']: {
+            'paid': round(entry['paid'], 2),
+            'owes': round(entry['owes'], 2),
+            'net': round(entry['paid'] - entry['owes'], 2)
+        }
+        for entry in checkpoint['balances']
+    }
+    return {
+        '_id': str(checkpoint['_id']),
+        'created_at': checkpoint['created_at'].isoformat(),
+        'covered_through': checkpoint['covered_through'].isoformat(),
+        'expense_count': checkpoint['expense_count'],
+        'total_amount': round(checkpoint['total_amount'], 2),
+        'balances': balances
+    }
+
+@app.route('/settle-up', methods=['POST'])
+@limit_concurrency('settle_up')
+def settle_up():
+    try:
+        try:
+            checkpoint, archived_count = create_checkpoint()
+        except SettleUpInProgress as e:
+            return api_response({
+                'success': False,
+                'message': str(e)
+            }), 409
+        if checkpoint is None:
+            return api_response({
+                'success': True,
+                'message': 'Nothing to settle - no expenses since the last checkpoint',
+                'archived_count': 0
+            }), 200
+        
+        invalidate_ledger()
+        if settlements_precomputer is not None:
+            settlements_precomputer.mark_dirty()
+        
+        return api_response({
+            'success': True,
+            'data': serialize_checkpoint(checkpoint),
+            'archived_count': archived_count,
+            'message': f'Settled up and archived {archived_count} expenses'
+        }), 201
+        
+    except Exception as e:
+        logger.error("Error in settle_up: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error settling up: {str(e)}'
+        }), 500
+
+@app.route('/checkpoints', methods=['GET'])
+def get_checkpoints():
+    try:
+        checkpoints = [
+            serialize_checkpoint(checkpoint)
+            for checkpoint in mongo.db.checkpoints.find({'state': {'$ne': 'pending'}}, {'debts': 0}).sort('created_at', -1)
+        ]
+        return api_response({
+            'success': True,
+            'data': checkpoints,
+            'count': len(checkpoints),
+            'message': f'Retrieved {len(checkpoints)} checkpoints successfully'
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error in get_checkpoints: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error retrieving checkpoints: {str(e)}'
+        }), 500
+
+@app.route('/debts/<debtor>/<creditor>', methods=['GET'])
+def get_pair_debt(debtor, creditor):
+    try:
+        # Both directions are fetched by _id in a single lookup
+        edges = {
+            (doc['debtor'], doc['creditor']): doc['amount']
+            for doc in mongo.db.debts.find({'_id': {'$in': [debt_key(debtor, creditor), debt_key(creditor, debtor)]}})
+        }
+        owes = edges.get((debtor, creditor), 0)
+        owed = edges.get((creditor, debtor), 0)
+        
+        return api_response({
+            'success': True,
+            'data': {
+                'from': debtor,
+                'to': creditor,
+                'owes': round(owes, 2),
+                'owed': round(owed, 2),
+                'net': round(owes - owed, 2)
+            },
+            'message': f'{debtor} owes {creditor} {round(owes - owed, 2)} net'
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error in get_pair_debt: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error retrieving debt: {str(e)}'
+        }), 500
+
+@app.route('/debts/<person>', methods=['GET'])
+def get_person_debts(person):
+    try:
+        owes = []
+        owed_by = []
+        net_by_person = {}
+        
+        for doc in mongo.db.debts.find({'$or': [{'debtor': person}, {'creditor': person}]}):
+            amount = round(doc['amount'], 2)
+            if abs(amount) < 0.01:
+                continue
+            if doc['debtor'] == person:
+                owes.append({'to': doc['creditor'], 'amount': amount})
+                net_by_person[doc['creditor']] = net_by_person.get(doc['creditor'], 0) + doc['amount']
+            else:
+                owed_by.append({'from': doc['debtor'], 'amount': amount})
+                net_by_person[doc['debtor']] = net_by_person.get(doc['debtor'], 0) - doc['amount']
+        
+        return api_response({
+            'success': True,
+            'data': {
+                'person': person,
+                'owes': sorted(owes, key=lambda edge: edge['to']),
+                'owed_by': sorted(owed_by, key=lambda edge: edge['from']),
+                'net_by_person': {other: round(net, 2) for other, net in sorted(net_by_person.items())}
+            },
+            'message': f'Retrieved {len(owes) + len(owed_by)} debts for {person}'
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error in get_person_debts: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error retrieving debts: {str(e)}'
+        }), 500
+
+# Helper function to read and validate the rollup granularity query parameter
+def parse_granularity(args, default):
+    granularity = args.get('granularity', default)
+    if granularity not in ROLLUP_GRANULARITIES:
+        return granularity, [f"granularity must be one of: {', '.join(ROLLUP_GRANULARITIES)}"]
+    return granularity, []
+
+# Helper function to format one rollup document for a response
+def serialize_rollup(doc):
+    return {
+        'person': doc['person'],
+        'bucket': doc['bucket'],
+        'paid': round(doc['paid'], 2),
+        'owes': round(doc['owes'], 2),
+        'expense_count': doc['expense_count']
+    }
+
+# One person's spend per day or month, read only from spend_rollups
+@app.route('/rollups/<person>', methods=['GET'])
+def get_person_rollups(person):
+    try:
+        granularity, errors = parse_granularity(request.args, 'month')
+        if errors:
+            return api_response({
+                'success': False,
+                'message': 'Invalid query parameters',
+                'errors': errors
+            }), 400
+        
+        # Buckets are zero-padded strings, so ranges compare lexically (e.g. start=2024-01)
+        query = {'person': person, 'granularity': granularity}
+        bucket_range = {}
+        if request.args.get('start'):
+            bucket_range['$gte'] = request.args['start']
+        if request.args.get('end'):
+            bucket_range['$lte'] = request.args['end']
+        if bucket_range:
+            query['bucket'] = bucket_range
+        
+        series = [serialize_rollup(doc) for doc in mongo.db.spend_rollups.find(query).sort('bucket', 1)]
+        
+        return api_response({
+            'success': True,
+            'data': {
+                'person': person,
+                'granularity': granularity,
+                'series': series
+            },
+            'count': len(series),
+            'message': f'Retrieved {len(series)} {granularity} rollups for {person}'
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error in get_person_rollups: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error retrieving rollups: {str(e)}'
+        }), 500
+
+# Top spenders for one bucket, read from the (granularity, bucket, paid) index
+@app.route('/leaderboard', methods=['GET'])
+def get_leaderboard():
+    try:
+        granularity, errors = parse_granularity(request.args, 'all')
+        bucket = request.args.get('bucket', 'all' if granularity == 'all' else None)
+        if bucket is None:
+            errors.append("bucket is required for day and month leaderboards (e.g. 2024-05 or 2024-05-31)")
+        try:
+            limit = int(request.args.get('limit', 10))
+            if limit < 1 or limit > 100:
+                errors.append("limit must be between 1 and 100")
+        except ValueError:
+            errors.append("limit must be an integer")
+        if errors:
+            return api_response({
+                'success': False,
+                'message': 'Invalid query parameters',
+                'errors': errors
+            }), 400
+        
+        cursor = mongo.db.spend_rollups.find(
+            {'granularity': granularity, 'bucket': bucket, 'paid': {'$gt': 0.005}}
+        ).sort('paid', -1).limit(limit)
+        leaders = [serialize_rollup(doc) for doc in cursor]
+        
+        return api_response({
+            'success': True,
+            'data': {
+                'granularity': granularity,
+                'bucket': bucket,
+                'leaders': leaders
+            },
+            'count': len(leaders),
+            'message': f'Retrieved top {len(leaders)} spenders'
+        }), 200
+        
+    except Exception as e:
+        logger.error("Error in get_leaderboard: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error retrieving leaderboard: {str(e)}'
+        }), 500
+
+# Rebuild the debt matrix from scratch (e.g. after a failed incremental update)
+@app.route('/admin/rebuild-debts', methods=['POST'])
+@limit_concurrency('rebuild_debts')
+def rebuild_debts():
+    try:
+        count = rebuild_debt_matrix()
+        return api_response({
+            'success': True,
+            'message': f'Rebuilt {count} debt edges',
+            'edge_count': count
+        }), 200
+    except Exception as e:
+        logger.error("Error in rebuild_debts: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error rebuilding debts: {str(e)}'
+        }), 500
+
+# CSV exports stream rows straight from a projected, batched cursor so memory
+# stays flat and the first bytes go out before the whole export is read
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+EXPORT_ROWS_PER_CHUNK = 500
+
+EXPENSE_EXPORT_PROJECTION = {
+    'created_at': 1, 'description': 1, 'paid_by': 1, 'amount': 1,
+    'split_type': 1, 'participants': 1, 'split_amounts': 1
+}
+
+# Helper function to keep spreadsheet apps from treating text cells as formulas
+def csv_safe(value):
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+# Helper function to stream rows as CSV in chunks
+def stream_csv(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    
+    count = 0
+    try:
+        for row in rows:
+            writer.writerow([csv_safe(value) for value in row])
+            count += 1
+            if count % EXPORT_ROWS_PER_CHUNK == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    except Exception as e:
+        # The 200 has already been sent; re-raising aborts the chunked body so
+        # the client sees a failed download rather than a short file
+        logger.error("CSV export failed after %d rows: %s", count, e)
+        raise
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# Helper function to build a streaming CSV download response
+def csv_response(filename, header, rows):
+    return Response(
+        stream_with_context(stream_csv(header, rows)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+# Helper function to flatten expenses into one row per person-share
+def expense_share_rows(cursors):
+    payers = []
+    for cursor in cursors:
+        for expense in cursor:
+            if 'split_amounts' in expense:
+                shares = stored_split_amounts(expense)
+            else:
+                # Documents written before split_amounts existed
+                if not payers:
+                    payers.extend(get_payers())
+                shares = calculate_individual_amounts(expense, payers)
+            
+            for person, share in shares.items():
+                yield [
+                    str(expense['_id']),
+                    expense['created_at'].isoformat(),
+                    expense['description'],
+                    expense['paid_by'],
+                    round(float(expense['amount']), 2),
+                    expense.get('split_type', 'equal'),
+                    person,
+                    round(share, 2)
+                ]
+
+@app.route('/export/expenses.csv', methods=['GET'])
+def export_expenses_csv():
+    query, errors = build_expense_filter(request.args)
+    if errors:
+        return api_response({
+            'success': False,
+            'message': 'Invalid filters',
+            'errors': errors
+        }), 400
+    
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+    if include_archived and '$text' in query:
+        # expenses_archive has no text index
+        return api_response({
+            'success': False,
+            'message': 'Invalid filters',
+            'errors': ["q cannot be combined with include_archived"]
+        }), 400
+    
+    cursors = []
+    if include_archived:
+        cursors.append(mongo.db.expenses_archive.with_options(read_preference=HEAVY_READ_PREFERENCE)
+                       .find(query, EXPENSE_EXPORT_PROJECTION, batch_size=EXPORT_BATCH_SIZE).sort('created_at', 1))
+    cursors.append(read_expenses().find(query, EXPENSE_EXPORT_PROJECTION, batch_size=EXPORT_BATCH_SIZE).sort('created_at', 1))
+    
+    try:
+        # Run the first query before the 200 goes out, so a database error is still a 500
+        rows = expense_share_rows(cursors)
+        first_row = list(itertools.islice(rows, 1))
+    except Exception as e:
+        logger.error("Error in export_expenses_csv: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error exporting expenses: {str(e)}'
+        }), 500
+    
+    header = ['expense_id', 'created_at', 'description', 'paid_by', 'amount', 'split_type', 'person', 'share']
+    return csv_response('expenses.csv', header, itertools.chain(first_row, rows))
+
+@app.route('/export/balances.csv', methods=['GET'])
+@limit_concurrency('export_balances')
+def export_balances_csv():
+    try:
+        balances = get_ledger().balances()
+    except Exception as e:
+        logger.error("Error in export_balances_csv: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error calculating balances: {str(e)}'
+        }), 500
+    
+    rows = ([person, balance['paid'], balance['owes'], balance['net']] for person, balance in sorted(balances.items()))
+    return csv_response('balances.csv', ['person', 'paid', 'owes', 'net'], rows)
+
+# Index check - explains every supported GET /expenses filter shape
+@app.route('/admin/index-check', methods=['GET'])
+@limit_concurrency('index_check')
+def index_check():
+    try:
+        results = {}
+        for name, (args, expected_indexes) in EXPENSE_FILTER_SHAPES.items():
+            query, _ = build_expense_filter(args)
+            results[name] = explain_expense_filter(query, expected_indexes)
+        
+        collscans = [name for name, result in results.items() if not result['uses_index']]
+        return api_response({
+            'success': not collscans,
+            'data': results,
+            'collscans': collscans,
+            'message': 'All filter shapes use their index' if not collscans else f'{len(collscans)} filter shapes miss their index'
+        }), 200
+    except Exception as e:
+        logger.error("Error in index_check: %s", e)
+        return api_response({
+            'success': False,
+            'message': f'Error checking indexes: {str(e)}'
+        }), 500
+
+# Live balance updates as server-sent events
+@app.route('/events', methods=['GET'])
+def balance_events():
+    subscriber = event_broadcaster.subscribe()
+    if subscriber is None:
+        response = api_response({
+            'success': False,
+            'message': 'Too many event subscribers, try again later'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(int(EVENTS_HEARTBEAT_S))
+        return response
+    
+    # The generator only touches the subscriber queue, so it does not keep the
+    # request context alive for the lifetime of the connection
+    return Response(
+        stream_events(subscriber),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Slow-operation log with sampled explain plans
+@app.route('/admin/slow-queries', methods=['GET'])
+def get_slow_queries():
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return api_response({
+            'success': False,
+            'message': 'limit must be an integer'
+        }), 400
+    
+    entries = slow_query_log.entries()[::-1][:limit]
+    return api_response({
+        'success': True,
+        'data': entries,
+        'count': len(entries),
+        'threshold_ms': SLOW_QUERY_MS,
+        'message': f'Retrieved {len(entries)} slow operations'
+    }), 200
+
+# Metrics endpoint - in-process counters and latency summaries
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return api_response({
+        'success': True,
+        'data': {
+            'write_coalescing': WRITE_COALESCING,
+            'mongo_pool': pool_monitor.stats(),
+            'admission': {name: limiter.stats() for name, limiter in admission_limiters.items()},
+            'events': event_broadcaster.stats(),
+            'circuit_breaker': db_breaker.stats(),
+            'heavy_read_preference': MONGO_HEAVY_READ_PREFERENCE,
+            **metrics.snapshot()
+        },
+        'message': 'Metrics retrieved successfully'
+    }), 200
+
 # Additional utility endpoint to clear all data (for testing)
 @app.route('/clear-data', methods=['DELETE'])
 def clear_data():
     try:
         result = mongo.db.expenses.delete_many({})
-        return jsonify({
+        mongo.db.debts.delete_many({})
+        mongo.db.checkpoints.delete_many({})
+        mongo.db.expenses_archive.delete_many({})
+        mongo.db.spend_rollups.delete_many({})
+        invalidate_checkpoint_cache()
+        if settlements_precomputer is not None:
+            settlements_precomputer.mark_dirty()
+        return api_response({
             'success': True,
             'message': f'Cleared {result.deleted_count} expenses',
             'deleted_count': result.deleted_count
         }), 200
     except Exception as e:
-        print(f"Error in clear_data: {e}")
-        return jsonify({
+        logger.error("Error in clear_data: %s", e)
+        return api_response({
             'success': False,
             'message': f'Error clearing data: {str(e)}'
         }), 500
@@ -661,42 +3593,62 @@ def clear_data():
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
-    return jsonify({
+    return api_response({
         'success': False,
         'message': 'Endpoint not found',
         'available_endpoints': [
             'GET / - API welcome and documentation',
             'GET /health - Health check',
+            'GET /health/live - Liveness check',
+            'GET /health/ready - Readiness check',
             'GET /expenses - List all expenses',
             'POST /expenses - Add new expense',
             'PUT /expenses/:id - Update expense',
             'DELETE /expenses/:id - Delete expense',
+            'POST /expenses/batch-get - Fetch expenses by ID',
+            'POST /expenses/batch-update - Update many expenses',
+            'POST /expenses/batch-delete - Delete many expenses',
             'GET /people - List all people',
             'GET /balances - Show balances',
+            'GET /balances/:person - Show one person\'s balance and statement',
             'GET /settlements - Get settlements',
+            'POST /settle-up - Checkpoint and archive expenses',
+            'GET /checkpoints - List checkpoints',
+            'GET /export/expenses.csv - Export expenses as CSV',
+            'GET /export/balances.csv - Export balances as CSV',
+            'GET /debts/:from/:to - Show pairwise debt',
+            'GET /debts/:person - Show one person\'s debts',
+            'POST /batch - Run several API requests at once',
+            'GET /rollups/:person - Show spend per day or month',
+            'GET /leaderboard - Show top spenders',
+            'GET /events - Live balance updates (server-sent events)',
+            'GET /metrics - In-process metrics',
+            'GET /admin/index-check - Verify expense filters use indexes',
+            'GET /admin/slow-queries - Show slow MongoDB operations',
             'DELETE /clear-data - Clear all data'
         ]
     }), 404
 
 @app.errorhandler(405)
 def method_not_allowed(error):
-    return jsonify({
+    return api_response({
         'success': False,
         'message': 'Method not allowed'
     }), 405
 
 @app.errorhandler(500)
 def internal_error(error):
-    return jsonify({
+    return api_response({
         'success': False,
         'message': 'Internal server error'
     }), 500
 
 if __name__ == '__main__':
-    print(f"Starting Enhanced Split App API server...")
-    print(f"Database: MongoDB Atlas")
-    print(f"Environment: {os.getenv('FLASK_ENV', 'development')}")
-    print(f"Features: Equal/Percentage/Exact/Shares splitting")
+    logger.info("Starting Enhanced Split App API server", extra={
+        'database': 'MongoDB Atlas',
+        'environment': os.getenv('FLASK_ENV', 'development'),
+        'features': 'Equal/Percentage/Exact/Shares splitting'
+    })
     
     # Get port from environment variable for deployment
     port = int(os.environ.get('PORT', 5000))
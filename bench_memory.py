@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the balance computation in ledger.py.
+
+Feeds synthetic expenses to the ledger at growing history sizes and reports
+the peak traced allocation (tracemalloc) for two strategies:
+
+  list    - materialize every full document first, as list(find()) did
+  stream  - add projected documents one at a time, as compute_ledger() does
+            with its batched cursor
+
+The streaming peak should stay flat as the expense count grows; the list
+peak grows linearly with history.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from ledger import build_ledger
+
+PEOPLE = ["Shantanu", "Sanket", "Om", "Asha", "Ravi", "Meera"]
+LEDGER_FIELDS = ('paid_by', 'amount', 'split_type', 'participants', 'split_amounts')
+
+
+def make_expense(index):
+    paid_by = PEOPLE[index % len(PEOPLE)]
+    amount = round(random.uniform(10, 2000), 2)
+    created_at = datetime(2024, 1, 1) + timedelta(minutes=index)
+    return {
+        '_id': f'{index:024x}',
+        'amount': amount,
+        'description': f'Expense {index} with a receipt note long enough to look like real data',
+        'paid_by': paid_by,
+        'split_type': 'equal',
+        'created_at': created_at,
+        'updated_at': created_at,
+        'split_amounts': [{'person': person, 'amount': amount / len(PEOPLE)} for person in PEOPLE]
+    }
+
+
+def full_documents(count):
+    for index in range(count):
+        yield make_expense(index)
+
+
+def projected_documents(count, batch_size):
+    # Stands in for a cursor with LEDGER_PROJECTION: documents arrive in
+    # batches of batch_size and only carry the fields the ledger reads
+    batch = []
+    for expense in full_documents(count):
+        batch.append({field: expense[field] for field in LEDGER_FIELDS if field in expense})
+        if len(batch) == batch_size:
+            yield from batch
+            batch = []
+    yield from batch
+
+
+def measure(strategy, count, batch_size):
+    tracemalloc.start()
+    start = time.perf_counter()
+    if strategy == 'list':
+        ledger = build_ledger(list(full_documents(count)))
+    else:
+        ledger = build_ledger(projected_documents(count, batch_size))
+    ledger.settlements()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare peak memory of list vs streaming ledger passes")
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='Comma-separated expense counts')
+    parser.add_argument('--strategies', default='list,stream',
+                        help='Comma-separated strategies to run (list, stream)')
+    parser.add_argument('--batch-size', type=int, default=2000,
+                        help='Cursor batch size for the stream strategy (LEDGER_BATCH_SIZE)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    strategies = [strategy.strip() for strategy in args.strategies.split(',')]
+
+    print(f"{'expenses':>10}{'strategy':>10}{'peak KiB':>12}{'seconds':>10}")
+    for size in sizes:
+        for strategy in strategies:
+            peak, elapsed = measure(strategy, size, args.batch_size)
+            print(f"{size:>10}{strategy:>10}{peak / 1024:>12.1f}{elapsed:>10.2f}")
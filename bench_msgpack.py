@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON vs MessagePack for Split App API payloads.
+
+Compares response size and encode/decode time for a synthetic GET /expenses
+payload, encoded the way app.py does it (ISO strings and string IDs for JSON,
+Timestamp and ObjectId extension types for MessagePack). With --base-url the
+live API is also fetched with both Accept headers to compare wire sizes.
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import msgpack
+import requests
+from bson import ObjectId
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+MSGPACK_OBJECTID_EXT = 1
+PEOPLE = ["Shantanu", "Sanket", "Om", "Asha", "Ravi", "Meera"]
+
+
+def msgpack_default(value):
+    if isinstance(value, ObjectId):
+        return msgpack.ExtType(MSGPACK_OBJECTID_EXT, value.binary)
+    if isinstance(value, datetime):
+        return msgpack.Timestamp.from_datetime(value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    raise TypeError(f'Cannot serialize {type(value).__name__} to MessagePack')
+
+
+def msgpack_ext_hook(code, data):
+    if code == MSGPACK_OBJECTID_EXT:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+def make_expense(index):
+    paid_by = random.choice(PEOPLE)
+    amount = round(random.uniform(10, 2000), 2)
+    created_at = datetime.utcnow() - timedelta(minutes=index)
+    participants = random.sample(PEOPLE, 3)
+    return {
+        '_id': ObjectId(),
+        'amount': amount,
+        'description': f'Expense {index}',
+        'paid_by': paid_by,
+        'split_type': 'equal',
+        'created_at': created_at,
+        'updated_at': created_at,
+        'split_amounts': [{'person': person, 'amount': round(amount / 3, 2)} for person in participants]
+    }
+
+
+def json_payload(expenses):
+    # Mirrors serialize_doc for JSON responses
+    data = []
+    for expense in expenses:
+        doc = dict(expense)
+        doc['_id'] = str(doc['_id'])
+        doc['created_at'] = doc['created_at'].isoformat()
+        doc['updated_at'] = doc['updated_at'].isoformat()
+        data.append(doc)
+    return {'success': True, 'data': data, 'count': len(data), 'message': 'Expenses retrieved successfully'}
+
+
+def msgpack_payload(expenses):
+    return {'success': True, 'data': expenses, 'count': len(expenses), 'message': 'Expenses retrieved successfully'}
+
+
+def time_it(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    return (time.perf_counter() - start) / rounds * 1000, result
+
+
+def run_synthetic(count, rounds):
+    expenses = [make_expense(index) for index in range(count)]
+    as_json = json_payload(expenses)
+    as_msgpack = msgpack_payload(expenses)
+
+    json_encode_ms, json_body = time_it(lambda: json.dumps(as_json).encode(), rounds)
+    json_decode_ms, _ = time_it(lambda: json.loads(json_body), rounds)
+    msgpack_encode_ms, msgpack_body = time_it(lambda: msgpack.packb(as_msgpack, default=msgpack_default), rounds)
+    msgpack_decode_ms, _ = time_it(lambda: msgpack.unpackb(msgpack_body, ext_hook=msgpack_ext_hook, timestamp=3), rounds)
+
+    print(f"Synthetic GET /expenses payload, {count} expenses, {rounds} rounds")
+    print(f"{'format':<10}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+    print(f"{'json':<10}{len(json_body):>12}{json_encode_ms:>12.3f}{json_decode_ms:>12.3f}")
+    print(f"{'msgpack':<10}{len(msgpack_body):>12}{msgpack_encode_ms:>12.3f}{msgpack_decode_ms:>12.3f}")
+    print(f"msgpack size: {len(msgpack_body) / len(json_body):.0%} of JSON")
+
+
+def run_live(base_url, paths):
+    print(f"\nLive API at {base_url}")
+    print(f"{'path':<20}{'json bytes':>12}{'msgpack bytes':>15}")
+    for path in paths:
+        json_response = requests.get(f"{base_url}{path}", headers={'Accept': 'application/json'}, timeout=30)
+        msgpack_response = requests.get(f"{base_url}{path}", headers={'Accept': MSGPACK_MIMETYPE}, timeout=30)
+        print(f"{path:<20}{len(json_response.content):>12}{len(msgpack_response.content):>15}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare JSON and MessagePack payload size and speed")
+    parser.add_argument('--count', type=int, default=1000, help='Expenses in the synthetic payload')
+    parser.add_argument('--rounds', type=int, default=50, help='Encode/decode repetitions')
+    parser.add_argument('--base-url', help='Also compare wire sizes against a running API')
+    args = parser.parse_args()
+
+    run_synthetic(args.count, args.rounds)
+    if args.base_url:
+        run_live(args.base_url.rstrip('/'), ['/expenses', '/balances', '/settlements'])
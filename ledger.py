@@ -0,0 +1,125 @@
+# Ledger engine - balances, totals and settlements computed in one pass over
+# an iterable of expenses. Kept free of Flask and MongoDB so it can be reused
+# by any route (and benchmarked) without a database.
+
+
+# Helper function to sum the owed amounts stored on an expense as split_amounts
+def stored_split_amounts(expense):
+    amounts = {}
+    for share in expense.get('split_amounts', []):
+        amounts[share['person']] = amounts.get(share['person'], 0) + share['amount']
+    return amounts
+
+
+class Ledger:
+    # split_amounts: function mapping an expense to {person: amount owed}
+    def __init__(self, split_amounts=stored_split_amounts):
+        self.split_amounts = split_amounts
+        self.paid = {}
+        self.owes = {}
+        self.total_amount = 0
+        self.expense_count = 0
+        self._settlements = None
+
+    def add(self, expense):
+        paid_by = expense['paid_by']
+        amount_paid = float(expense['amount'])
+        self.total_amount += amount_paid
+        self.expense_count += 1
+        self.paid[paid_by] = self.paid.get(paid_by, 0) + amount_paid
+        self.owes.setdefault(paid_by, 0)
+
+        for person, amount_owed in self.split_amounts(expense).items():
+            self.paid.setdefault(person, 0)
+            self.owes[person] = self.owes.get(person, 0) + amount_owed
+
+        self._settlements = None
+
+    # Start from the paid/owes totals carried over by a settle-up checkpoint
+    def add_opening_balances(self, balances, total_amount=0, expense_count=0):
+        for entry in balances:
+            person = entry['person']
+            self.paid[person] = self.paid.get(person, 0) + entry['paid']
+            self.owes[person] = self.owes.get(person, 0) + entry['owes']
+        self.total_amount += total_amount
+        self.expense_count += expense_count
+        self._settlements = None
+
+    # Raw (unrounded) paid/owes per person, as stored in a checkpoint
+    def opening_balances(self):
+        return [
+            {'person': person, 'paid': self.paid[person], 'owes': self.owes.get(person, 0)}
+            for person in self.paid
+        ]
+
+    def add_all(self, expenses):
+        for expense in expenses:
+            self.add(expense)
+        return self
+
+    # Paid, owes and net per person, rounded to 2 decimal places
+    def balances(self):
+        balances = {}
+        for person in self.paid:
+            paid = self.paid[person]
+            owes = self.owes.get(person, 0)
+            balances[person] = {
+                'paid': round(paid, 2),
+                'owes': round(owes, 2),
+                'net': round(paid - owes, 2)
+            }
+        return balances
+
+    # Settlement transactions pairing debtors with creditors
+    def settlements(self):
+        if self._settlements is not None:
+            return self._settlements
+
+        settlements = []
+        debtors = []  # People who owe money
+        creditors = []  # People who are owed money
+
+        for person, balance in self.balances().items():
+            if balance['net'] < -0.01:  # Owes money (with small tolerance for floating point)
+                debtors.append({'person': person, 'amount': abs(balance['net'])})
+            elif balance['net'] > 0.01:  # Is owed money
+                creditors.append({'person': person, 'amount': balance['net']})
+
+        # Create optimal settlements
+        for debtor in debtors:
+            remaining_debt = debtor['amount']
+
+            for creditor in creditors:
+                if remaining_debt <= 0.01:
+                    break
+
+                if creditor['amount'] <= 0.01:
+                    continue
+
+                settlement_amount = min(remaining_debt, creditor['amount'])
+
+                settlements.append({
+                    'from': debtor['person'],
+                    'to': creditor['person'],
+                    'amount': round(settlement_amount, 2)
+                })
+
+                remaining_debt -= settlement_amount
+                creditor['amount'] -= settlement_amount
+
+        self._settlements = settlements
+        return settlements
+
+    def summary(self):
+        balances = self.balances()
+        return {
+            'balances': balances,
+            'total_amount': round(self.total_amount, 2),
+            'num_people': len(balances),
+            'expense_count': self.expense_count
+        }
+
+
+# Batch API: build a ledger from any iterable of expenses (list, cursor, generator)
+def build_ledger(expenses, split_amounts=stored_split_amounts):
+    return Ledger(split_amounts).add_all(expenses)
@@ -1,6 +1,14 @@
 import requests
 import json
 import time
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import msgpack
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Base URL - Update this with deployed URL
@@ -79,6 +87,18 @@ def test_health_check():
             print_success("Health check passed")
             print_info(f"Database status: {data.get('database', 'unknown')}")
             print_info(f"Timestamp: {data.get('timestamp', 'unknown')}")
+            
+            live = requests.get(f"{BASE_URL}/health/live", headers={'X-Request-ID': 'test-api-live'}, timeout=10)
+            if live.headers.get('X-Request-ID') == 'test-api-live':
+                print_success("Request ID echoed in X-Request-ID")
+            else:
+                print_error(f"X-Request-ID not echoed: {live.headers.get('X-Request-ID')}")
+            ready = requests.get(f"{BASE_URL}/health/ready", timeout=10)
+            if live.status_code == 200 and ready.status_code == 200:
+                latency = ready.json()['database']['latency']
+                print_success(f"Liveness and readiness passed (ping p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms)")
+            else:
+                print_error(f"Liveness/readiness failed - Statuses: {live.status_code}, {ready.status_code}")
             return True
         else:
             print_error(f"Health check failed - Status: {response.status_code}")
@@ -330,6 +350,97 @@ def test_get_operations():
     except Exception as e:
         print_error(f"Error getting people: {e}")
 
+def test_expense_filters():
+    """Test server-side expense filters and their index usage"""
+    print_header("Testing Expense Filters")
+    
+    filters = [
+        ("paid_by", {"paid_by": "Shantanu"}, lambda e: e['paid_by'] == "Shantanu"),
+        ("participant", {"participant": "Om"}, lambda e: any(p['person'] == "Om" for p in e.get('participants', []))),
+        ("split_type", {"split_type": "shares"}, lambda e: e['split_type'] == "shares"),
+        ("amount range", {"min_amount": 300, "max_amount": 600}, lambda e: 300 <= e['amount'] <= 600),
+        ("text search", {"q": "pizza"}, lambda e: "pizza" in e['description'].lower())
+    ]
+    
+    for name, params, predicate in filters:
+        try:
+            response = requests.get(f"{BASE_URL}/expenses", params=params, timeout=10)
+            if response.status_code == 200 and all(predicate(e) for e in response.json()['data']):
+                print_success(f"Filter by {name}: {response.json()['count']} expenses")
+            else:
+                print_error(f"Filter by {name} failed - Status: {response.status_code}")
+        except Exception as e:
+            print_error(f"Error testing filter by {name}: {e}")
+    
+    try:
+        today = datetime.utcnow().strftime('%Y-%m-%d')
+        response = requests.get(f"{BASE_URL}/expenses", params={"start_date": today, "end_date": today}, timeout=10)
+        if response.status_code == 200 and response.json()['count'] > 0:
+            print_success(f"Date-only end_date includes the whole day: {response.json()['count']} expenses today")
+        else:
+            print_error(f"Date-only end_date excluded today's expenses - Status: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error testing date range filter: {e}")
+    
+    try:
+        response = requests.get(f"{BASE_URL}/expenses", params={"min_amount": "abc"}, timeout=10)
+        if response.status_code == 400:
+            print_success("Invalid filter handling works correctly")
+        else:
+            print_warning(f"Invalid filter test got status: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error testing invalid filter: {e}")
+    
+    try:
+        response = requests.get(f"{BASE_URL}/admin/index-check", timeout=30)
+        data = response.json()
+        if response.status_code == 200 and data.get('success'):
+            print_success("All filter shapes use an index")
+        else:
+            print_error(f"Filter shapes missing their index: {', '.join(data.get('collscans', []))}")
+    except Exception as e:
+        print_error(f"Error running index check: {e}")
+
+# Expected MongoDB round trips per request (X-DB-Round-Trips). Update these
+# deliberately when a change adds or removes queries on purpose.
+EXPECTED_ROUND_TRIPS = [
+    ("GET", "/health", None, 0),
+    ("GET", "/health/live", None, 0),
+    ("GET", "/health/ready", None, 0),
+    ("GET", "/expenses", None, 1),
+    ("GET", "/people", None, 2),
+    ("GET", "/balances", None, 2),
+    ("GET", "/settlements", None, 2),
+    ("GET", "/balances/Shantanu", None, 3),
+    ("GET", "/debts/Sanket/Shantanu", None, 1),
+    ("GET", "/debts/Shantanu", None, 1),
+    # Writes reuse the checkpoint cached by the read just before (CHECKPOINT_CACHE_S);
+    # /people reads the latest checkpoint, so the POST always finds it warm
+    ("GET", "/people", None, 2),
+    ("POST", "/expenses", {"amount": 120, "description": "Coffee", "paid_by": "Shantanu"}, 5)
+]
+
+def test_query_counts():
+    """Pin the number of MongoDB round trips each endpoint makes"""
+    print_header("Testing MongoDB Round Trips per Request")
+    passed = 0
+    for method, path, body, expected in EXPECTED_ROUND_TRIPS:
+        try:
+            response = requests.request(method, f"{BASE_URL}{path}", json=body, timeout=10)
+            actual = response.headers.get('X-DB-Round-Trips')
+            if actual is None:
+                print_error(f"{method} {path}: no X-DB-Round-Trips header")
+            elif int(actual) == expected:
+                print_success(f"{method} {path}: {actual} round trips")
+                passed += 1
+            else:
+                print_error(f"{method} {path}: {actual} round trips, expected {expected}")
+        except Exception as e:
+            print_error(f"Error checking round trips for {method} {path}: {e}")
+    
+    print_info(f"Round-trip checks passed: {passed}/{len(EXPECTED_ROUND_TRIPS)}")
+    return passed == len(EXPECTED_ROUND_TRIPS)
+
 def test_balances():
     """Test balance calculations"""
     print_header("Testing Balance Calculations")
@@ -354,6 +465,32 @@ def test_balances():
     except Exception as e:
         print_error(f"Error getting balances: {e}")
 
+def test_person_balance():
+    """Test per-person balance and statement"""
+    print_header("Testing Per-Person Balance")
+    try:
+        overall = requests.get(f"{BASE_URL}/balances", timeout=10).json()['data']['balances']
+        for person, expected in overall.items():
+            response = requests.get(f"{BASE_URL}/balances/{person}", params={"page_size": 100}, timeout=10)
+            if response.status_code != 200:
+                print_error(f"Failed to get balance for {person} - Status: {response.status_code}")
+                continue
+            data = response.json()['data']
+            statement = data['statement']
+            running = statement[-1]['running_balance'] if statement else 0
+            if abs(data['balance']['net'] - expected['net']) <= 0.05 and abs(running - expected['net']) <= 0.05:
+                print_success(f"{person}: net ₹{data['balance']['net']} over {len(statement)} statement rows")
+            else:
+                print_error(f"{person}: net ₹{data['balance']['net']} does not match /balances ₹{expected['net']}")
+        
+        response = requests.get(f"{BASE_URL}/balances/Nobody", timeout=10)
+        if response.status_code == 404:
+            print_success("Unknown person handling works correctly")
+        else:
+            print_warning(f"Unknown person test got status: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error testing per-person balance: {e}")
+
 def test_settlements():
     """Test settlement calculations"""
     print_header("Testing Settlement Calculations")
@@ -375,6 +512,115 @@ def test_settlements():
     except Exception as e:
         print_error(f"Error getting settlements: {e}")
 
+def test_debts():
+    """Test pairwise debt lookups against balances"""
+    print_header("Testing Pairwise Debts")
+    try:
+        balances = requests.get(f"{BASE_URL}/balances", timeout=10).json()['data']['balances']
+        for person, balance in balances.items():
+            response = requests.get(f"{BASE_URL}/debts/{person}", timeout=10)
+            if response.status_code != 200:
+                print_error(f"Failed to get debts for {person} - Status: {response.status_code}")
+                continue
+            net_owed = sum(response.json()['data']['net_by_person'].values())
+            if abs(-net_owed - balance['net']) <= 0.05:
+                print_success(f"{person}: pairwise debts match net balance ₹{balance['net']}")
+            else:
+                print_error(f"{person}: pairwise debts sum to ₹{-net_owed}, balance is ₹{balance['net']}")
+        
+        response = requests.get(f"{BASE_URL}/debts/Sanket/Shantanu", timeout=10)
+        if response.status_code == 200:
+            data = response.json()['data']
+            print_info(f"Sanket owes Shantanu ₹{data['net']} net")
+        else:
+            print_error(f"Failed to get pairwise debt - Status: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error testing debts: {e}")
+
+def test_spend_rollups():
+    """Test spend rollups and the top-spender leaderboard against balances"""
+    print_header("Testing Spend Rollups")
+    try:
+        balances = requests.get(f"{BASE_URL}/balances", timeout=10).json()['data']['balances']
+        response = requests.get(f"{BASE_URL}/leaderboard", params={'limit': 5}, timeout=10)
+        if response.status_code != 200:
+            print_error(f"Leaderboard failed - Status: {response.status_code}")
+            return False
+        leaders = response.json()['data']['leaders']
+        for leader in leaders:
+            print_info(f"  {leader['person']}: paid ₹{leader['paid']} over {leader['expense_count']} expenses")
+        
+        if all(abs(leader['paid'] - balances[leader['person']]['paid']) <= 0.05 for leader in leaders if leader['person'] in balances):
+            print_success("Leaderboard totals match balances")
+        else:
+            print_error("Leaderboard totals do not match balances")
+        
+        response = requests.get(f"{BASE_URL}/rollups/Shantanu", params={'granularity': 'day'}, timeout=10)
+        if response.status_code == 200:
+            print_success(f"Retrieved {response.json()['count']} daily rollups for Shantanu")
+        else:
+            print_error(f"Rollups failed - Status: {response.status_code}")
+        
+        response = requests.get(f"{BASE_URL}/leaderboard", params={'granularity': 'month'}, timeout=10)
+        if response.status_code == 400:
+            print_success("Missing bucket rejected")
+        return True
+    except Exception as e:
+        print_error(f"Error testing spend rollups: {e}")
+        return False
+
+def test_batch_requests():
+    """Test running several requests through POST /batch"""
+    print_header("Testing Request Batching")
+    try:
+        batch = {"requests": [
+            {"method": "GET", "path": "/expenses"},
+            {"method": "GET", "path": "/balances"},
+            {"method": "GET", "path": "/settlements"},
+            {"method": "GET", "path": "/people"}
+        ]}
+        response = requests.post(f"{BASE_URL}/batch", json=batch, timeout=10)
+        if response.status_code != 200:
+            print_error(f"Batch request failed - Status: {response.status_code}")
+            return False
+        
+        results = response.json()['data']
+        direct = requests.get(f"{BASE_URL}/balances", timeout=10).json()['data']
+        if [result['status'] for result in results] == [200, 200, 200, 200] and results[1]['body']['data'] == direct:
+            print_success(f"Home screen batch returned 4 responses in one request ({response.headers.get('X-DB-Round-Trips')} round trips)")
+        else:
+            print_error("Batch responses do not match the individual endpoints")
+        
+        response = requests.post(f"{BASE_URL}/batch", json={"requests": [{"method": "POST", "path": "/batch"}]}, timeout=10)
+        if response.status_code == 400:
+            print_success("Nested batch rejected")
+        else:
+            print_error(f"Nested batch got status: {response.status_code}")
+        return True
+    except Exception as e:
+        print_error(f"Error testing batch requests: {e}")
+        return False
+
+def test_csv_exports():
+    """Test CSV exports of expenses and balances"""
+    print_header("Testing CSV Exports")
+    try:
+        response = requests.get(f"{BASE_URL}/export/expenses.csv", timeout=30)
+        lines = response.text.strip().splitlines()
+        if response.status_code == 200 and lines and lines[0].startswith("expense_id,"):
+            print_success(f"Expenses CSV: {len(lines) - 1} person-share rows")
+        else:
+            print_error(f"Expenses CSV failed - Status: {response.status_code}")
+        
+        response = requests.get(f"{BASE_URL}/export/balances.csv", timeout=30)
+        lines = response.text.strip().splitlines()
+        if response.status_code == 200 and lines and lines[0] == "person,paid,owes,net":
+            print_success(f"Balances CSV: {len(lines) - 1} people")
+        else:
+            print_error(f"Balances CSV failed - Status: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error testing CSV exports: {e}")
+
 def test_update_operations(expense_ids):
     """Test update operations"""
     if not expense_ids:
@@ -408,6 +654,21 @@ def test_update_operations(expense_ids):
     except Exception as e:
         print_error(f"Error updating expense: {e}")
     
+    # Test optimistic concurrency with If-Match
+    try:
+        response = requests.put(f"{BASE_URL}/expenses/{expense_ids[0]}", json={"description": "Petrol (receipt checked)"}, timeout=10)
+        etag = response.headers.get('ETag')
+        print_info(f"Description-only update: {response.headers.get('X-DB-Round-Trips')} round trips, ETag {etag}")
+        
+        response = requests.put(f"{BASE_URL}/expenses/{expense_ids[0]}", json={"description": "Petrol (first editor)"}, headers={'If-Match': etag}, timeout=10)
+        stale = requests.put(f"{BASE_URL}/expenses/{expense_ids[0]}", json={"description": "Petrol (second editor)"}, headers={'If-Match': etag}, timeout=10)
+        if response.status_code == 200 and stale.status_code == 409:
+            print_success("Stale If-Match rejected with 409")
+        else:
+            print_error(f"If-Match handling failed - Statuses: {response.status_code}, {stale.status_code}")
+    except Exception as e:
+        print_error(f"Error testing If-Match: {e}")
+    
     # Test invalid expense ID
     try:
         response = requests.put(f"{BASE_URL}/expenses/invalid_id", json={"amount": 100}, timeout=10)
@@ -418,6 +679,51 @@ def test_update_operations(expense_ids):
     except Exception as e:
         print_error(f"Error testing invalid ID: {e}")
 
+def test_batch_operations(expense_ids):
+    """Test batch get, update and delete"""
+    if not expense_ids or len(expense_ids) < 3:
+        print_warning("Not enough expense IDs available for batch testing")
+        return
+    
+    print_header("Testing Batch Operations")
+    
+    try:
+        response = requests.post(f"{BASE_URL}/expenses/batch-get",
+                                 json={"ids": expense_ids[:3] + ["507f1f77bcf86cd799439011"]}, timeout=10)
+        data = response.json()
+        if response.status_code == 200 and data['count'] == 3 and len(data['missing']) == 1:
+            print_success("Batch get returned 3 expenses and 1 missing ID")
+        else:
+            print_error(f"Batch get failed - Status: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error testing batch get: {e}")
+    
+    try:
+        updates = [
+            {"_id": expense_ids[1], "description": "Groceries (batch updated)"},
+            {"_id": expense_ids[2], "amount": -5},
+            {"_id": "invalid_id", "amount": 100},
+            {"_id": expense_ids[0], "version": 999, "description": "Stale batch update"}
+        ]
+        response = requests.post(f"{BASE_URL}/expenses/batch-update", json={"updates": updates}, timeout=10)
+        statuses = [item['status'] for item in response.json()['data']]
+        if response.status_code == 200 and statuses == [200, 400, 400, 409]:
+            print_success("Batch update returned per-item results")
+        else:
+            print_error(f"Batch update failed - Status: {response.status_code}, items: {statuses}")
+    except Exception as e:
+        print_error(f"Error testing batch update: {e}")
+    
+    try:
+        response = requests.post(f"{BASE_URL}/expenses/batch-delete", json={"ids": ["507f1f77bcf86cd799439011"]}, timeout=10)
+        statuses = [item['status'] for item in response.json()['data']]
+        if response.status_code == 200 and statuses == [404]:
+            print_success("Batch delete reports missing expenses")
+        else:
+            print_error(f"Batch delete failed - Status: {response.status_code}, items: {statuses}")
+    except Exception as e:
+        print_error(f"Error testing batch delete: {e}")
+
 def test_delete_operations(expense_ids):
     """Test delete operations"""
     if not expense_ids or len(expense_ids) < 2:
@@ -446,6 +752,45 @@ def test_delete_operations(expense_ids):
     except Exception as e:
         print_error(f"Error testing non-existent expense: {e}")
 
+def test_settle_up():
+    """Test settle-up checkpoints keep balances unchanged"""
+    print_header("Testing Settle-Up Checkpoint")
+    try:
+        before = requests.get(f"{BASE_URL}/balances", timeout=10).json()['data']['balances']
+        expenses = requests.get(f"{BASE_URL}/expenses", timeout=10).json()['data']
+        
+        response = requests.post(f"{BASE_URL}/settle-up", timeout=30)
+        if response.status_code not in (200, 201):
+            print_error(f"Settle-up failed - Status: {response.status_code}")
+            return
+        print_success(f"Settled up, archived {response.json()['archived_count']} expenses")
+        
+        after = requests.get(f"{BASE_URL}/balances", timeout=10).json()['data']['balances']
+        if all(abs(after[person]['net'] - balance['net']) <= 0.01 for person, balance in before.items()):
+            print_success("Balances unchanged after settle-up")
+        else:
+            print_error("Balances changed after settle-up")
+        
+        if expenses:
+            settled_id = expenses[0]['_id']
+            update = requests.put(f"{BASE_URL}/expenses/{settled_id}", json={"amount": 1}, timeout=10)
+            delete = requests.delete(f"{BASE_URL}/expenses/{settled_id}", timeout=10)
+            if update.status_code == 409 and delete.status_code == 409:
+                print_success("Settled expense rejected with 409 for update and delete")
+            else:
+                print_error(f"Settled expense got update {update.status_code}, delete {delete.status_code}")
+        
+        remaining = requests.get(f"{BASE_URL}/expenses", timeout=10).json()['count']
+        print_info(f"Expenses left in the hot collection: {remaining}")
+        
+        response = requests.get(f"{BASE_URL}/checkpoints", timeout=10)
+        if response.status_code == 200:
+            print_success(f"Checkpoints: {response.json()['count']}")
+        else:
+            print_error(f"Failed to list checkpoints - Status: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error testing settle-up: {e}")
+
 def test_error_endpoints():
     """Test error handling for non-existent endpoints"""
     print_header("Testing Error Endpoints")
@@ -470,6 +815,99 @@ def test_error_endpoints():
     except Exception as e:
         print_error(f"Error testing 405: {e}")
 
+def test_events_stream():
+    """Test the server-sent events feed"""
+    print_header("Testing Live Balance Events")
+    try:
+        with requests.get(f"{BASE_URL}/events", stream=True, timeout=10) as stream:
+            if stream.status_code != 200 or not stream.headers.get('Content-Type', '').startswith('text/event-stream'):
+                print_error(f"Event stream failed - Status: {stream.status_code}")
+                return False
+            
+            created = requests.post(f"{BASE_URL}/expenses", json={"amount": 90, "description": "Event chai", "paid_by": "Sanket"}, timeout=10)
+            event_type = None
+            for line in stream.iter_lines(decode_unicode=True):
+                if line.startswith('event: '):
+                    event_type = line[len('event: '):]
+                elif line.startswith('data: ') and event_type == 'balances':
+                    data = json.loads(line[len('data: '):])
+                    print_success(f"Received balances event for {', '.join(data['balances'])}")
+                    break
+        
+        requests.delete(f"{BASE_URL}/expenses/{created.json()['data']['_id']}", timeout=10)
+        return True
+    except Exception as e:
+        print_error(f"Error testing event stream: {e}")
+        return False
+
+def test_msgpack_negotiation():
+    """Test MessagePack request bodies and responses"""
+    print_header("Testing MessagePack Negotiation")
+    headers = {'Content-Type': 'application/msgpack', 'Accept': 'application/msgpack'}
+    try:
+        body = msgpack.packb({"amount": 120, "description": "Msgpack snacks", "paid_by": "Om"})
+        response = requests.post(f"{BASE_URL}/expenses", data=body, headers=headers, timeout=10)
+        if response.status_code != 201 or response.headers.get('Content-Type') != 'application/msgpack':
+            print_error(f"Msgpack POST failed - Status: {response.status_code}")
+            return False
+        
+        expense = msgpack.unpackb(response.content, timestamp=3)['data']
+        if not isinstance(expense['created_at'], datetime) or not isinstance(expense['_id'], msgpack.ExtType):
+            print_error("Msgpack response did not use native Timestamp/ObjectId encoding")
+            return False
+        print_success("Msgpack POST returned native Timestamp and ObjectId values")
+        
+        json_size = len(requests.get(f"{BASE_URL}/expenses", timeout=10).content)
+        msgpack_size = len(requests.get(f"{BASE_URL}/expenses", headers={'Accept': 'application/msgpack'}, timeout=10).content)
+        print_info(f"GET /expenses: {json_size} bytes as JSON, {msgpack_size} bytes as msgpack")
+        
+        expense_id = expense['_id'].data.hex()
+        requests.delete(f"{BASE_URL}/expenses/{expense_id}", timeout=10)
+        return True
+    except Exception as e:
+        print_error(f"Error testing msgpack negotiation: {e}")
+        return False
+
+def test_metrics_endpoint():
+    """Test the metrics endpoint"""
+    print_header("Testing Metrics Endpoint")
+    try:
+        response = requests.get(f"{BASE_URL}/metrics", timeout=10)
+        if response.status_code == 200:
+            data = response.json()['data']
+            print_success("Metrics endpoint working")
+            print_info(f"Write coalescing: {'enabled' if data.get('write_coalescing') else 'disabled'}")
+            print_info(f"Circuit breaker: {data.get('circuit_breaker', {}).get('state', 'unknown')}")
+            for name, series in data.get('series', {}).items():
+                print_info(f"  {name}: avg {series['avg']}, p95 {series['p95']}, max {series['max']}")
+            return True
+        else:
+            print_error(f"Metrics endpoint failed - Status: {response.status_code}")
+            return False
+    except Exception as e:
+        print_error(f"Error testing metrics endpoint: {e}")
+        return False
+
+def test_slow_queries():
+    """Test the slow-operation log"""
+    print_header("Testing Slow-Operation Log")
+    try:
+        response = requests.get(f"{BASE_URL}/admin/slow-queries", params={'limit': 5}, timeout=10)
+        if response.status_code == 200:
+            data = response.json()
+            print_success(f"Slow-operation log working ({data['count']} entries over {data['threshold_ms']} ms)")
+            for entry in data['data']:
+                explain = entry.get('explain', {})
+                indexes = ', '.join(explain.get('indexes', [])) or 'not sampled'
+                print_info(f"  {entry['route']}: {entry['command']} on {entry['collection']} {entry['duration_ms']} ms, indexes: {indexes}")
+            return True
+        else:
+            print_error(f"Slow-operation log failed - Status: {response.status_code}")
+            return False
+    except Exception as e:
+        print_error(f"Error testing slow-operation log: {e}")
+        return False
+
 def run_comprehensive_test():
     """Run all tests in sequence"""
     print(f"{Colors.BOLD}{Colors.MAGENTA}🚀 Enhanced Split App API Testing Suite{Colors.END}")
@@ -514,18 +952,39 @@ def run_comprehensive_test():
     
     # Test GET operations
     test_get_operations()
+    test_expense_filters()
     
     # Test calculations
     test_balances()
+    test_person_balance()
     test_settlements()
+    test_debts()
+    test_spend_rollups()
+    test_batch_requests()
+    test_csv_exports()
+    test_query_counts()
     
     # Test update and delete operations
     test_update_operations(all_expense_ids)
+    test_batch_operations(all_expense_ids)
     test_delete_operations(all_expense_ids)
     
+    # Test settle-up checkpoint
+    test_settle_up()
+    
     # Test error handling
     test_error_endpoints()
     
+    # Test live balance events
+    test_events_stream()
+    
+    # Test MessagePack negotiation
+    test_msgpack_negotiation()
+    
+    # Test metrics
+    test_metrics_endpoint()
+    test_slow_queries()
+    
     print_header("Test Summary")
     print_success("All tests completed!")
     print_info(f"Test finished at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -536,5 +995,211 @@ def run_comprehensive_test():
     test_balances()
     test_settlements()
 
+def test_coalesced_insert_timeout(port, mongo_uri):
+    """Test that an insert outliving WRITE_COALESCING_TIMEOUT_S answers 202 and still commits intact"""
+    print_header("Testing Coalesced Insert Timeout")
+    # A flush window longer than the timeout guarantees the 202 path
+    process = start_local_app(port, mongo_uri, {
+        "WRITE_COALESCING": "true",
+        "WRITE_COALESCING_MAX_WAIT_MS": "500",
+        "WRITE_COALESCING_TIMEOUT_S": "0.05"
+    })
+    base_url = f"http://localhost:{port}"
+    try:
+        response = requests.post(f"{base_url}/expenses",
+                                 json={"amount": 120, "description": "Late insert", "paid_by": "LateInsert"}, timeout=10)
+        data = response.json()
+        if response.status_code != 202 or not data.get('pending'):
+            print_error(f"Expected 202 pending - Status: {response.status_code}")
+            return False
+        expense_id = data['data']['_id']
+        print_success("Timed-out coalesced insert answered 202 with its pending ID")
+        
+        time.sleep(1)
+        found = requests.post(f"{base_url}/expenses/batch-get", json={"ids": [expense_id]}, timeout=10).json()
+        if found['count'] == 1 and found['data'][0]['_id'] == expense_id:
+            print_success("Late insert stored under the returned ID")
+        else:
+            print_error(f"Late insert not found under {expense_id}")
+        
+        rollups = requests.get(f"{base_url}/rollups/LateInsert", params={'granularity': 'all'}, timeout=10).json()
+        if rollups.get('count') == 1:
+            print_success("Late insert counted in spend rollups")
+        else:
+            print_error("Late insert missing from spend rollups")
+        
+        requests.post(f"{base_url}/expenses/batch-delete", json={"ids": [expense_id]}, timeout=10)
+        return True
+    except Exception as e:
+        print_error(f"Error testing coalesced insert timeout: {e}")
+        return False
+    finally:
+        process.terminate()
+        process.wait()
+
+# Load testing mode
+DEFAULT_LOAD_MIX = "GET /expenses=3,GET /balances=3,GET /settlements=2,GET /people=1,GET /health=1,POST /expenses=1"
+LOAD_PEOPLE = ["Shantanu", "Sanket", "Om"]
+
+def parse_load_mix(mix):
+    """Parse 'METHOD /path=weight,...' into (method, path, weight) tuples"""
+    routes = []
+    for entry in mix.split(','):
+        route, _, weight = entry.strip().rpartition('=')
+        method, _, path = route.strip().partition(' ')
+        routes.append((method.upper(), path, float(weight)))
+    return routes
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def start_local_app(port, mongo_uri, extra_env=None):
+    """Start app.py on the given port against mongo_uri and wait until /health responds"""
+    env = dict(os.environ, PORT=str(port), FLASK_ENV="production", MONGO_URI=mongo_uri, **(extra_env or {}))
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen([sys.executable, "app.py"], cwd=app_dir, env=env)
+    
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app.py exited with code {process.returncode}")
+        try:
+            if requests.get(f"http://localhost:{port}/health", timeout=1).status_code == 200:
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    
+    process.terminate()
+    raise RuntimeError("app.py did not become healthy within 30 seconds")
+
+def run_load_test(concurrency, duration, mix):
+    """Drive the API from a thread pool with persistent connections and report per-route latency"""
+    routes = parse_load_mix(mix)
+    weights = [weight for _, _, weight in routes]
+    local = threading.local()
+    results = []
+    created_ids = []
+    results_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    
+    def get_session():
+        # One keep-alive session per worker thread
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+    
+    def worker():
+        session = get_session()
+        samples = []
+        created = []
+        while time.perf_counter() < deadline:
+            method, path, _ = random.choices(routes, weights=weights)[0]
+            body = None
+            if method == "POST" and path == "/expenses":
+                body = {
+                    "amount": random.randint(50, 2000),
+                    "description": "Load test expense",
+                    "paid_by": random.choice(LOAD_PEOPLE)
+                }
+            
+            started = time.perf_counter()
+            try:
+                response = session.request(method, f"{BASE_URL}{path}", json=body, timeout=30)
+                ok = response.status_code < 400
+                status = response.status_code
+            except requests.exceptions.RequestException:
+                ok = False
+                status = None
+            samples.append((f"{method} {path}", (time.perf_counter() - started) * 1000, ok, status))
+            if body is not None and status in (201, 202):
+                created.append(response.json()['data']['_id'])
+        
+        with results_lock:
+            results.extend(samples)
+            created_ids.extend(created)
+    
+    print_header(f"Load Test: {concurrency} workers for {duration}s")
+    print_info(f"Request mix: {mix}")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+    elapsed = time.perf_counter() - started
+    
+    worker_errors = []
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            worker_errors.append(e)
+    for error in worker_errors:
+        print_error(f"Load worker failed: {error!r}")
+    
+    remove_load_expenses(created_ids)
+    
+    by_route = {}
+    for route, latency, ok, status in results:
+        by_route.setdefault(route, []).append((latency, ok, status))
+    by_route["TOTAL"] = [(latency, ok, status) for _, latency, ok, status in results]
+    
+    print(f"\n{'Route':<22}{'Requests':>10}{'Errors':>8}{'Req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, samples in by_route.items():
+        latencies = sorted(latency for latency, _, _ in samples)
+        errors = sum(1 for _, ok, _ in samples if not ok)
+        print(f"{route:<22}{len(samples):>10}{errors:>8}{len(samples) / elapsed:>10.1f}"
+              f"{percentile(latencies, 50):>10.1f}{percentile(latencies, 95):>10.1f}{percentile(latencies, 99):>10.1f}")
+    
+    shed = sum(1 for _, _, _, status in results if status == 503)
+    if shed:
+        print_warning(f"{shed} requests were shed with 503 (admission control)")
+    if worker_errors:
+        raise RuntimeError(f"{len(worker_errors)} of {concurrency} load workers failed")
+    return by_route
+
+def remove_load_expenses(expense_ids, batch_size=500):
+    """Delete the expenses a load test created, so runs leave the database as they found it"""
+    deleted = 0
+    for start in range(0, len(expense_ids), batch_size):
+        try:
+            response = requests.post(f"{BASE_URL}/expenses/batch-delete", json={"ids": expense_ids[start:start + batch_size]}, timeout=60)
+            deleted += response.json().get('deleted_count', 0)
+        except Exception as e:
+            print_error(f"Error removing load test expenses: {e}")
+    if expense_ids:
+        print_info(f"Removed {deleted} of {len(expense_ids)} load test expenses")
+
 if __name__ == "__main__":
-    run_comprehensive_test()
+    parser = argparse.ArgumentParser(description="Split App API test suite")
+    parser.add_argument("--base-url", default=BASE_URL, help="API base URL")
+    parser.add_argument("--load", action="store_true", help="Run the concurrent load test instead of the functional tests")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent workers in load mode")
+    parser.add_argument("--duration", type=float, default=30, help="Load test duration in seconds")
+    parser.add_argument("--mix", default=DEFAULT_LOAD_MIX, help="Weighted request mix, e.g. 'GET /balances=3,POST /expenses=1'")
+    parser.add_argument("--start-app", action="store_true", help="Start app.py locally for the run, against --test-mongo-uri")
+    parser.add_argument("--test-mongo-uri", default=os.getenv("TEST_MONGO_URI"),
+                        help="Separate test database for --start-app (default: TEST_MONGO_URI)")
+    parser.add_argument("--port", type=int, default=5001, help="Port for the locally started app")
+    args = parser.parse_args()
+    
+    BASE_URL = args.base_url
+    app_process = None
+    if args.start_app:
+        if not args.test_mongo_uri or args.test_mongo_uri == os.getenv("MONGO_URI"):
+            parser.error("--start-app needs --test-mongo-uri (or TEST_MONGO_URI) pointing at a database other than MONGO_URI")
+        BASE_URL = f"http://localhost:{args.port}"
+        app_process = start_local_app(args.port, args.test_mongo_uri)
+    
+    try:
+        if args.load:
+            run_load_test(args.concurrency, args.duration, args.mix)
+        else:
+            run_comprehensive_test()
+            if app_process is not None:
+                test_coalesced_insert_timeout(args.port + 1, args.test_mongo_uri)
+    finally:
+        if app_process is not None:
+            app_process.terminate()
+            app_process.wait()